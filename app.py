@@ -1,27 +1,98 @@
-from flask import Flask
+import atexit
+import logging
+import os
+import queue
+import ssl
+from logging.handlers import QueueHandler, QueueListener
+import orjson
+from flask import Flask, request
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from config import config
 from models import db
 from routes import main_blueprint
 
+CORS_MAX_AGE = 86400
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson for faster request parsing and responses."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+def configure_logging():
+    """
+    Route all log records through a queue so request threads never block on
+    handler I/O; a single listener thread feeds the original handlers.
+    """
+    root = logging.getLogger()
+    if any(isinstance(h, QueueHandler) for h in root.handlers):
+        return
+    handlers = root.handlers[:] or [logging.StreamHandler()]
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    root.handlers = [QueueHandler(log_queue)]
+    listener.start()
+    atexit.register(listener.stop)
+
+
+def log_crypto_backend():
+    """
+    Password checks hash with hashlib.sha1, which is OpenSSL's EVP_sha1.
+    OpenSSL 1.1.1+ picks the SHA-NI code path at runtime when the CPU has
+    it, so the linked version is what decides hashing throughput.
+    """
+    logging.getLogger(__name__).info("hashlib backend: %s", ssl.OPENSSL_VERSION)
+    if ssl.OPENSSL_VERSION_INFO < (1, 1, 1):
+        logging.getLogger(__name__).warning(
+            "OpenSSL older than 1.1.1; SHA-1 will not use SHA-NI acceleration"
+        )
+
 
 def create_app():
+    configure_logging()
+    log_crypto_backend()
     app = Flask(__name__)
     app.config.from_object(config)
+    app.json = OrjsonProvider(app)
     
     # Initialize SQLAlchemy
     db.init_app(app)
 
     # --- ✅ Enable CORS ---
-    # Allow both local development and production frontend domains
-    CORS(app, resources={r"/*": {"origins": "*"}})
+    # Allow both local development and production frontend domains.
+    # max_age lets browsers cache the preflight instead of re-sending OPTIONS.
+    CORS(app, resources={r"/api/*": {
+        "origins": os.getenv("CORS_ORIGINS", "*").split(","),
+        "max_age": CORS_MAX_AGE,
+        "supports_credentials": False,
+    }})
+
+    @app.before_request
+    def short_circuit_preflight():
+        # Answer preflights before routing; flask-cors adds the CORS headers
+        if request.method == "OPTIONS":
+            return "", 204, {"Access-Control-Max-Age": str(CORS_MAX_AGE)}
 
     # --- ✅ Register Blueprints ---
     app.register_blueprint(main_blueprint, url_prefix="/api")
 
     # --- ✅ Auto-create tables only in development ---
-    with app.app_context():
+    # Production schemas are created once with `flask --app app init-db`
+    if app.config.get("DEBUG"):
+        with app.app_context():
+            db.create_all()
+
+    @app.cli.command("init-db")
+    def init_db():
+        """Create all database tables."""
         db.create_all()
+        print("Database tables created.")
 
     # Optional health check route
     @app.route("/api/ping")
@@ -33,4 +104,4 @@ def create_app():
 
 if __name__ == "__main__":
     app = create_app()
-    app.run(debug=True, threaded=False,port=5000,host="0.0.0.0")
+    app.run(debug=True, port=5000, host="0.0.0.0")
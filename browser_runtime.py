@@ -0,0 +1,208 @@
+"""
+The asyncio loop thread and the Playwright browser shared by every part
+of the app that drives Chromium: streamed sessions, isolated sessions and
+the opt-in browser HIBP lookup. Request threads hand coroutines to the
+loop with run_async/run_many/loop_submit; Playwright objects are bound to
+this loop, so everything touching them must run there.
+"""
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Persistent async loop in its own thread; _loop_ready is set once it's running
+_loop = None
+_loop_ready = threading.Event()
+
+# uvloop (in requirements; not available on Windows) has finer-grained timers
+# (steadier frame pacing), faster CDP/DTLS socket I/O and a cheaper
+# call_soon_threadsafe for the cross-thread hop
+try:
+    from uvloop import new_event_loop as _new_event_loop
+except ImportError:
+    _new_event_loop = asyncio.new_event_loop
+
+def init_loop():
+    global _loop
+    _loop = _new_event_loop()
+    asyncio.set_event_loop(_loop)
+    _loop.call_soon(_loop_ready.set)
+    _loop.run_forever()
+
+threading.Thread(target=init_loop, daemon=True).start()
+_loop_ready.wait()
+
+# Coroutines from request threads are queued here and started by one drain
+# callback. Only the submit that finds the queue idle wakes the loop
+# (call_soon_threadsafe writes to its self-pipe), so a burst of requests
+# costs one wakeup instead of one per run_coroutine_threadsafe call.
+_outbound = deque()
+_outbound_lock = threading.Lock()
+_drain_scheduled = False
+
+def _drain_outbound():
+    global _drain_scheduled
+    with _outbound_lock:
+        batch = list(_outbound)
+        _outbound.clear()
+        _drain_scheduled = False
+    for coro, fut in batch:
+        # fut is left pending (not set_running) so the caller can still
+        # cancel it, which cancels the task below
+        if fut.cancelled():
+            coro.close()  # caller gave up before it started
+            continue
+        task = _loop.create_task(coro)
+        task.add_done_callback(lambda t, fut=fut: _settle(fut, t))
+        fut.add_done_callback(lambda f, task=task: f.cancelled() and _loop.call_soon_threadsafe(task.cancel))
+
+def _settle(fut, task):
+    if fut.done():
+        return
+    try:
+        if task.cancelled():
+            fut.cancel()
+        elif task.exception() is not None:
+            fut.set_exception(task.exception())
+        else:
+            fut.set_result(task.result())
+    except concurrent.futures.InvalidStateError:
+        pass  # the caller cancelled it just now
+
+def _submit(coro):
+    global _drain_scheduled
+    if not _loop_ready.is_set():
+        raise RuntimeError("Async loop not initialized")
+    fut = concurrent.futures.Future()
+    with _outbound_lock:
+        _outbound.append((coro, fut))
+        wake = not _drain_scheduled
+        _drain_scheduled = True
+    if wake:
+        _loop.call_soon_threadsafe(_drain_outbound)
+    return fut
+
+def run_async(coro, timeout=30):
+    fut = _submit(coro)
+    try:
+        return fut.result(timeout=timeout)
+    except TimeoutError:
+        # Nobody is waiting for it any more; stop it instead of letting it
+        # keep a page or connection busy on the loop
+        fut.cancel()
+        raise
+
+def run_many(coros, timeout=30, return_exceptions=False):
+    """Run several coroutines concurrently on the shared loop with a single
+    cross-thread hop; results come back in order."""
+    async def _gather():
+        return await asyncio.gather(*coros, return_exceptions=return_exceptions)
+    return run_async(_gather(), timeout=timeout)
+
+def loop_submit(coro):
+    """Schedule a coroutine on the shared loop without waiting for its result."""
+    return _submit(coro)
+
+def loop_alive():
+    return _loop is not None and _loop.is_running()
+
+# ----- Shared Playwright browser -----
+# One Playwright driver + Chromium process for the whole app; each streamed
+# or isolated session gets its own context (separate cookies/storage).
+BROWSER_ARGS = [
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-blink-features=AutomationControlled',
+    '--disable-gpu',
+    '--no-first-run',
+    '--no-default-browser-check',
+    '--disable-web-security',
+    '--disable-features=VizDisplayCompositor',
+]
+# A long-lived Chromium slowly accumulates memory across contexts, so after
+# this many contexts the next session gets a freshly launched browser. The
+# old one keeps serving its open sessions and is closed by the cleanup loop
+# once its last context is gone.
+BROWSER_RECYCLE_AFTER = 200
+_playwright = None
+_browser = None
+_browser_lock = None
+_browser_uses = 0  # contexts opened on the current _browser
+_retired_browsers = []
+# browser -> new_context() calls still waiting on CDP. A context only shows
+# up in browser.contexts once Chromium answers, so without this a browser
+# retired meanwhile could be closed under a caller. Loop thread only.
+_pending_contexts = {}
+
+async def _lease_browser():
+    """Return the browser for a new context, launching (or relaunching, if
+    it died or is due for recycling) it as needed, and count the lease."""
+    global _playwright, _browser, _browser_lock, _browser_uses
+    if _browser_lock is None:
+        _browser_lock = asyncio.Lock()
+    async with _browser_lock:
+        if _browser is not None and _browser_uses >= BROWSER_RECYCLE_AFTER:
+            logger.info(f"Recycling shared browser after {_browser_uses} contexts")
+            _retired_browsers.append(_browser)
+            _browser = None
+        if _browser is None or not _browser.is_connected():
+            if _playwright is None:
+                from playwright.async_api import async_playwright
+                _playwright = await async_playwright().start()
+            _browser = await _playwright.chromium.launch(headless=True, args=BROWSER_ARGS)
+            _browser_uses = 0
+        _browser_uses += 1
+        _pending_contexts[_browser] = _pending_contexts.get(_browser, 0) + 1
+        return _browser
+
+async def new_context(**kwargs):
+    """Open a browser context (kwargs as for Browser.new_context) on the
+    shared browser. The browser can't be closed as drained until the
+    context exists."""
+    browser = await _lease_browser()
+    try:
+        return await browser.new_context(**kwargs)
+    finally:
+        remaining = _pending_contexts[browser] - 1
+        if remaining:
+            _pending_contexts[browser] = remaining
+        else:
+            del _pending_contexts[browser]
+
+async def close_drained_browsers():
+    """Close retired browsers with no open or still-opening contexts."""
+    for browser in list(_retired_browsers):
+        if browser in _pending_contexts:
+            continue
+        if browser.is_connected() and browser.contexts:
+            continue
+        _retired_browsers.remove(browser)
+        try:
+            await browser.close()
+        except Exception:
+            logger.exception("Error closing retired browser")
+
+async def _shutdown_browser():
+    global _playwright, _browser
+    for browser in _retired_browsers:
+        await browser.close()
+    _retired_browsers.clear()
+    if _browser is not None:
+        await _browser.close()
+        _browser = None
+    if _playwright is not None:
+        await _playwright.stop()
+        _playwright = None
+
+def _stop_shared_browser():
+    try:
+        run_async(_shutdown_browser(), timeout=10)
+    except Exception:
+        logger.exception("Error stopping shared browser")
+
+atexit.register(_stop_shared_browser)
@@ -1,25 +1,72 @@
 import os
+from functools import cache
 from dotenv import load_dotenv
 
-# Load all variables from .env file into environment
-load_dotenv()
 
+@cache
+def _init_env():
+    # Load all variables from .env file into environment (once per process)
+    load_dotenv(override=False)
 
-class Config:
-    # Load configuration variables
-    SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", "sqlite:///sentinelid.db")
 
-    SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
-    OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+_init_env()
+
+# Load configuration variables
+SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", "sqlite:///sentinelid.db")
+
+_IS_SQLITE = SQLALCHEMY_DATABASE_URI.startswith("sqlite")
+
+# Pool connections instead of reconnecting per request; SQLite connections
+# may be handed between request threads, so disable its thread check.
+SQLALCHEMY_ENGINE_OPTIONS = {
+    "pool_pre_ping": True,
+    "pool_recycle": 1800,
+    # Compiled-SQL LRU cache; sized above the default (500) so every route's
+    # statements stay cached and skip recompilation
+    "query_cache_size": 1000,
+    "connect_args": {"check_same_thread": False} if _IS_SQLITE else {},
+}
+if ":memory:" not in SQLALCHEMY_DATABASE_URI and SQLALCHEMY_DATABASE_URI != "sqlite://":
+    # In-memory SQLite uses a single static connection and takes no pool size
+    SQLALCHEMY_ENGINE_OPTIONS.update(pool_size=10, max_overflow=20)
+
+SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
+OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 
-    DEBUG = os.getenv("DEBUG", "True").lower() in ("true", "1", "yes")
+DEBUG = os.getenv("DEBUG", "True").lower() in ("true", "1", "yes")
 
-    MODEL_NAME = os.getenv("MODEL_NAME", "google/gemma-3n-e2b-it:free")
+MODEL_NAME = os.getenv("MODEL_NAME", "google/gemma-3n-e2b-it:free")
 
-    LOG_FILE = "user_choices.csv"
-    CSV_FIELDS = ["user_id", "session_id", "choice", "features"]
+# Upper bound (seconds) a request thread may wait on the LLM provider
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "1"))
+# Log raw LLM responses (at DEBUG level); off by default, even in development
+DEBUG_LLM = os.getenv("DEBUG_LLM", "False").lower() in ("true", "1", "yes")
 
-    DEFAULT_UA = "my-password-checker/1.0"
+LOG_FILE = "user_choices.csv"
+CSV_FIELDS = ["user_id", "session_id", "choice", "features"]
+
+DEFAULT_UA = "my-password-checker/1.0"
+
+# Look emails up through a headless browser instead of a plain HTTPS request
+HIBP_EMAIL_USE_BROWSER = os.getenv("HIBP_EMAIL_USE_BROWSER", "False").lower() in ("true", "1", "yes")
+
+
+class Config:
+    # Values are resolved once at import; the class only groups them for Flask
+    SQLALCHEMY_DATABASE_URI = SQLALCHEMY_DATABASE_URI
+    SQLALCHEMY_ENGINE_OPTIONS = SQLALCHEMY_ENGINE_OPTIONS
+    SECRET_KEY = SECRET_KEY
+    OPENROUTER_API_KEY = OPENROUTER_API_KEY
+    DEBUG = DEBUG
+    MODEL_NAME = MODEL_NAME
+    LLM_TIMEOUT = LLM_TIMEOUT
+    LLM_MAX_RETRIES = LLM_MAX_RETRIES
+    DEBUG_LLM = DEBUG_LLM
+    LOG_FILE = LOG_FILE
+    CSV_FIELDS = CSV_FIELDS
+    DEFAULT_UA = DEFAULT_UA
+    HIBP_EMAIL_USE_BROWSER = HIBP_EMAIL_USE_BROWSER
 
 
 # Create a single config instance
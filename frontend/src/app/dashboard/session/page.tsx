@@ -33,7 +33,6 @@ interface Session {
   status: string;
   created_at: string;
   last_activity: string;
-  screenshot?: string;
   is_isolated: boolean;
 }
 
@@ -43,7 +42,6 @@ interface SavedSession {
   url: string;
   title: string;
   saved_at: string;
-  screenshot?: string;
 }
 
 interface WebRTCConfig {
@@ -743,11 +741,12 @@ export default function TabManager() {
                   }`}
                 >
                   <img
-                    src={
-                      session.screenshot
-                        ? `data:image/png;base64,${session.screenshot}`
-                        : "/placeholder.png"
-                    }
+                    src={`${API_BASE}/sessions/${session.session_id}/thumbnail.jpg?v=${encodeURIComponent(session.last_activity)}`}
+                    loading="lazy"
+                    onError={(e) => {
+                      e.currentTarget.onerror = null;
+                      e.currentTarget.src = "/placeholder.png";
+                    }}
                     className="w-16 h-10 object-cover rounded border border-slate-700"
                     alt="session thumbnail"
                   />
@@ -809,11 +808,12 @@ export default function TabManager() {
                   className="flex items-center gap-2 border border-slate-800 rounded-lg p-2 bg-slate-950/40"
                 >
                   <img
-                    src={
-                      saved.screenshot
-                        ? `data:image/png;base64,${saved.screenshot}`
-                        : "/placeholder.png"
-                    }
+                    src={`${API_BASE}/sessions/saved/${saved.id}/thumbnail.jpg`}
+                    loading="lazy"
+                    onError={(e) => {
+                      e.currentTarget.onerror = null;
+                      e.currentTarget.src = "/placeholder.png";
+                    }}
                     className="w-12 h-8 object-cover rounded border border-slate-700"
                     alt="saved thumbnail"
                   />
@@ -1,16 +1,32 @@
 from __future__ import annotations
-from typing import Any, Dict, List, Optional, Annotated
+from typing import Any, Dict, List, Optional, Annotated, Union
 from datetime import datetime
 from enum import Enum
+import sqlite3
 
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import ForeignKey, String, Integer, Boolean, Text, Float, JSON, DateTime
+from sqlalchemy import ForeignKey, String, Integer, Boolean, Text, Float, JSON, DateTime, Index, desc, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from pydantic import BaseModel, Field, constr, conint, confloat
+import msgspec
 
 
 db: SQLAlchemy = SQLAlchemy()
 
+
+@event.listens_for(Engine, "connect")
+def _set_sqlite_pragma(dbapi_connection, connection_record) -> None:
+    """
+    Use WAL on SQLite so readers don't block the writer and concurrent
+    requests don't serialize on the database file lock; with WAL,
+    synchronous=NORMAL is still durable across app crashes.
+    """
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
 # --------------------------------------------------------------------------
 # 🧩 SQLAlchemy ORM MODELS (typed)
 # --------------------------------------------------------------------------
@@ -53,9 +69,13 @@ class User(db.Model):
 
 class Alias(db.Model):
     __tablename__ = "alias"
+    __table_args__ = (
+        # Serves per-user listings ordered by newest first
+        Index("ix_alias_user_created", "user_id", desc("created_at")),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), nullable=False)
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), nullable=False, index=True)
     alias_email: Mapped[str] = mapped_column(String(120), unique=True, nullable=False)
     generated_password: Mapped[Optional[str]] = mapped_column(String(128))
     site_name: Mapped[Optional[str]] = mapped_column(String(100))
@@ -91,7 +111,9 @@ class Leak(db.Model):
     __tablename__ = "leak"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    alias_id: Mapped[Optional[int]] = mapped_column(ForeignKey("alias.id"), nullable=True)
+    alias_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("alias.id", ondelete="SET NULL"), nullable=True, index=True
+    )
     breach_source: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
     detected_at: Mapped[datetime] = mapped_column(DateTime, default=db.func.current_timestamp())
 
@@ -129,7 +151,7 @@ class Session(db.Model):
     __tablename__ = "session"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), nullable=False)
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), nullable=False, index=True)
     start_time: Mapped[datetime] = mapped_column(DateTime, default=db.func.current_timestamp())
     active: Mapped[bool] = mapped_column(Boolean, default=True)
 
@@ -155,7 +177,9 @@ class SessionTab(db.Model):
     __tablename__ = "session_tab"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    session_id: Mapped[int] = mapped_column(ForeignKey("session.id"), nullable=False)
+    session_id: Mapped[int] = mapped_column(
+        ForeignKey("session.id", ondelete="CASCADE"), nullable=False, index=True
+    )
 
     url: Mapped[str] = mapped_column(String(512), nullable=False)
     title: Mapped[Optional[str]] = mapped_column(String(256), nullable=True)
@@ -192,9 +216,13 @@ class IncidentCorrelation(db.Model):
     __tablename__ = "incident_correlation"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    leak_id: Mapped[int] = mapped_column(ForeignKey("leak.id"), nullable=False)
-    session_id: Mapped[Optional[int]] = mapped_column(ForeignKey("session.id"), nullable=True)
-    alias_id: Mapped[Optional[int]] = mapped_column(ForeignKey("alias.id"), nullable=True)
+    leak_id: Mapped[int] = mapped_column(ForeignKey("leak.id"), nullable=False, index=True)
+    session_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("session.id", ondelete="SET NULL"), nullable=True, index=True
+    )
+    alias_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("alias.id", ondelete="SET NULL"), nullable=True, index=True
+    )
     correlation_confidence: Mapped[float] = mapped_column(Float, default=0.0)
     correlation_factors: Mapped[Dict[str, Any]] = mapped_column(JSON, nullable=True)
     correlated_at: Mapped[datetime] = mapped_column(DateTime, default=db.func.current_timestamp())
@@ -226,7 +254,7 @@ class IncidentCorrelation(db.Model):
         return f"<IncidentCorrelation id={self.id} leak_id={self.leak_id} confidence={self.correlation_confidence}>"
 
 # --------------------------------------------------------------------------
-# 🧠 ENUMS & Pydantic MODELS (runtime validation)
+# 🧠 ENUMS & msgspec STRUCTS (runtime validation)
 # --------------------------------------------------------------------------
 
 class UserChoice(str, Enum):
@@ -236,39 +264,39 @@ class UserChoice(str, Enum):
     SPOOF = "SPOOF"
 
 
-class ChoiceLog(BaseModel):
-    """Pydantic model for incoming user choice logs."""
-    user_id: Annotated[str, Field(..., description="Unique user ID.")]
-    session_id: Annotated[str, Field(..., description="Associated session ID.")]
-    choice: UserChoice = Field(..., description="User decision outcome.")
-    features: Dict[str, Any] = Field(..., description="Behavioral feature data.")
+class ChoiceLog(msgspec.Struct, frozen=True, gc=False):
+    """msgspec struct for incoming user choice logs."""
+    user_id: Union[str, int]  # Unique user ID.
+    session_id: Union[str, int]  # Associated session ID.
+    choice: UserChoice  # User decision outcome.
+    features: Dict[str, Any] = msgspec.field(default_factory=dict)  # Behavioral feature data.
 
 
 # --------------------------------------------------------------------------
 # 🔐 Breach / Security Models
 # --------------------------------------------------------------------------
 
-class BreachDetail(BaseModel):
-    AddedDate: Annotated[str, Field(...)]
-    Attribution: Optional[str]
-    BreachDate: Annotated[str, Field(...)]
-    DataClasses: Annotated[List[str], Field(...)]
-    Description: Annotated[str, Field(...)]
-    DisclosureUrl: Optional[str]
-    Domain: Annotated[str, Field(...)]
-    IsFabricated: Annotated[bool, Field(...)]
-    IsMalware: Annotated[bool, Field(...)]
-    IsRetired: Annotated[bool, Field(...)]
-    IsSensitive: Annotated[bool, Field(...)]
-    IsSpamList: Annotated[bool, Field(...)]
-    IsStealerLog: Annotated[bool, Field(...)]
-    IsSubscriptionFree: Annotated[bool, Field(...)]
-    IsVerified: Annotated[bool, Field(...)]
-    LogoPath: Optional[str]
-    ModifiedDate: Annotated[str, Field(...)]
-    Name: Annotated[str, Field(...)]
-    PwnCount: Annotated[int, Field(gt=-1)]
-    Title: Annotated[str, Field(...)]
+class BreachDetail(msgspec.Struct, kw_only=True):
+    AddedDate: str
+    Attribution: Optional[str] = None
+    BreachDate: str
+    DataClasses: List[str]
+    Description: str
+    DisclosureUrl: Optional[str] = None
+    Domain: str
+    IsFabricated: bool
+    IsMalware: bool
+    IsRetired: bool
+    IsSensitive: bool
+    IsSpamList: bool
+    IsStealerLog: bool
+    IsSubscriptionFree: bool
+    IsVerified: bool
+    LogoPath: Optional[str] = None
+    ModifiedDate: str
+    Name: str
+    PwnCount: Annotated[int, msgspec.Meta(ge=0)]
+    Title: str
 
 
 class BreachAction(str, Enum):
@@ -283,11 +311,11 @@ class BreachStatus(str, Enum):
     ERROR = "ERROR"
 
 
-class BreachReport(BaseModel):
+class BreachReport(msgspec.Struct, kw_only=True):
     action: BreachAction
-    breach_count: Annotated[int, Field(..., ge=0)]
-    breaches: Annotated[List[str], Field(...)]
-    details: Annotated[List[BreachDetail], Field(...)]
+    breach_count: Annotated[int, msgspec.Meta(ge=0)]
+    breaches: List[str]
+    details: List[BreachDetail]
     status: BreachStatus
 
 
@@ -297,7 +325,7 @@ class PasswordStatus(str, Enum):
     ERROR = "ERROR"
 
 
-class PasswordBreachResponse(BaseModel):
-    count: Annotated[int, Field(..., ge=0)]
-    message: Annotated[str, Field(...)]
+class PasswordBreachResponse(msgspec.Struct, kw_only=True):
+    count: Annotated[int, msgspec.Meta(ge=0)]
+    message: str
     status: PasswordStatus
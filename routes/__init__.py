@@ -1,29 +1,48 @@
+from importlib import import_module
+from typing import TYPE_CHECKING
+
 from flask import Blueprint
 
-# Import submodules after creating blueprint
-from .auth_routes import auth_bp
-from .alias_routes import alias_bp
-from .breach_routes import breach_bp
-from .password_routes import password_bp
-from .session_routes import session_bp
-from .ai_routes import ai_bp
-from .incident_routes import incident_bp
-from .isolated_routes import isolated_bp
-# Create the main blueprint
-main_blueprint = Blueprint("main", __name__)
-
-
-
-# ✅ Register all child blueprints under main
-# Each child keeps its own prefix internally (optional)
-main_blueprint.register_blueprint(auth_bp, url_prefix="/auth")
-main_blueprint.register_blueprint(alias_bp)
-main_blueprint.register_blueprint(breach_bp, url_prefix="/breach")
-main_blueprint.register_blueprint(password_bp, url_prefix="/password")
-main_blueprint.register_blueprint(ai_bp, url_prefix="/ai")
-main_blueprint.register_blueprint(incident_bp, url_prefix="/incidents")
-main_blueprint.register_blueprint(isolated_bp, url_prefix="/isolated")
-main_blueprint.register_blueprint(session_bp)
+if TYPE_CHECKING:
+    main_blueprint: Blueprint
+
+# (module, blueprint attribute, url_prefix) for every child blueprint.
+# Child modules are only imported when `main_blueprint` is first requested,
+# so importing a single route module (tests, CLI) doesn't pull in Playwright,
+# aiortc and the rest of the app.
+_CHILD_BLUEPRINTS = (
+    (".auth_routes", "auth_bp", "/auth"),
+    (".alias_routes", "alias_bp", None),
+    (".breach_routes", "breach_bp", "/breach"),
+    (".password_routes", "password_bp", "/password"),
+    (".ai_routes", "ai_bp", "/ai"),
+    (".incident_routes", "incident_bp", "/incidents"),
+    (".isolated_routes", "isolated_bp", "/isolated"),
+    (".session_routes", "session_bp", None),
+)
+
+
+def _build_main_blueprint() -> Blueprint:
+    # Create the main blueprint
+    blueprint = Blueprint("main", __name__)
+
+    # ✅ Register all child blueprints under main
+    # Each child keeps its own prefix internally (optional)
+    for module_name, attr, url_prefix in _CHILD_BLUEPRINTS:
+        child = getattr(import_module(module_name, __name__), attr)
+        if url_prefix:
+            blueprint.register_blueprint(child, url_prefix=url_prefix)
+        else:
+            blueprint.register_blueprint(child)
+    return blueprint
+
+
+def __getattr__(name):
+    if name == "main_blueprint":
+        blueprint = _build_main_blueprint()
+        globals()["main_blueprint"] = blueprint
+        return blueprint
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 __all__ = ["main_blueprint"]
@@ -1,16 +1,23 @@
+import logging
+import msgspec
 from flask import Blueprint, jsonify, request
-from utils import classify_behavior, write_to_csv, sort_emails, summarize_incident
+from models import ChoiceLog
+from utils import classify_behavior, parse_json_or_400, write_to_csv, sort_emails, summarize_incident
 
 ai_bp = Blueprint("ai", __name__)
+logger = logging.getLogger(__name__)
+
+_CHOICE_DECODER = msgspec.json.Decoder(ChoiceLog)
+_MONITOR_REQUIRED = frozenset(("url", "actions", "api_calls"))
+_EMAIL_SORT_REQUIRED = frozenset(("email_content",))
+_SUMMARY_REQUIRED = frozenset(("incident_details",))
 
 
 @ai_bp.route("/agentic-monitor", methods=["POST"])
 def monitor_tabs():
-    data = request.get_json()
-    required = {"url", "actions", "api_calls"}
-
-    if not data or not required.issubset(data):
-        return jsonify({"error": f"Missing fields: {required - set(data or {})}"}), 400
+    data, err = parse_json_or_400(_MONITOR_REQUIRED)
+    if err:
+        return err
 
     prompt = f"URL: {data['url']}\nActions: {data['actions']}\nAPI Calls: {data['api_calls']}"
     classification = classify_behavior(prompt)
@@ -26,33 +33,33 @@ def monitor_tabs():
 def log_user_choice():
     """
     Receives JSON with keys: user_id, session_id, choice, features
-    Writes a line to CSV via write_to_csv.
+    Validates it straight from the raw body into a ChoiceLog and
+    writes a line to CSV via write_to_csv.
     """
     try:
-        data = request.get_json()
-        if not data:
+        body = request.get_data()
+        if not body:
             return jsonify({"status": "error", "message": "No JSON provided"}), 400
 
-        required = {"user_id", "session_id", "choice"}
-        if not required.issubset(data):
-            return jsonify({
-                "status": "error",
-                "message": f"Missing fields: {required - set(data.keys())}"
-            }), 400
+        try:
+            log_entry = _CHOICE_DECODER.decode(body)
+        except msgspec.DecodeError as e:
+            # ValidationError is a DecodeError; covers missing fields and bad choices
+            return jsonify({"status": "error", "message": str(e)}), 400
 
-        write_to_csv(data)
-        return jsonify({"status": "success", "logged_entry": data}), 200
+        write_to_csv(log_entry)
+        return jsonify({"status": "success", "logged_entry": msgspec.to_builtins(log_entry)}), 200
 
     except Exception as e:
-        print(f"[ERROR] log_user_choice(): {e}")
+        logger.exception("log_user_choice failed")
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
 @ai_bp.route("/email-sort", methods=["POST"])
 def sort_email():
-    data = request.get_json()
-    if not data or "email_content" not in data:
-        return jsonify({"error": "email_content is required"}), 400
+    data, err = parse_json_or_400(_EMAIL_SORT_REQUIRED, "email_content is required")
+    if err:
+        return err
 
     category = sort_emails(data["email_content"])
     return jsonify(category), 200
@@ -60,9 +67,9 @@ def sort_email():
 
 @ai_bp.route("/incident-summary", methods=["POST"])
 def get_summary():
-    data = request.get_json()
-    if not data or "incident_details" not in data:
-        return jsonify({"error": "incident_details is required"}), 400
+    data, err = parse_json_or_400(_SUMMARY_REQUIRED, "incident_details is required")
+    if err:
+        return err
 
     summary = summarize_incident(data["incident_details"])
     return jsonify({"summary": summary}), 200
@@ -1,60 +1,124 @@
-import secrets
-from flask import Blueprint, jsonify, request
-from models import db, Alias, User
-from utils import generate_random_password
+import logging
+import os
+import re
+import orjson
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from models import db, Alias, IncidentCorrelation, User
+from utils import generate_random_password, parse_json_list_or_400, parse_json_or_400
 
 alias_bp = Blueprint("alias", __name__)
+logger = logging.getLogger(__name__)
+
+# Classifies the (already lower-cased) input in one match: a full email
+# address, a bare domain, or a +tag for the user's own address.
+_ALIAS_CLASSIFIER = re.compile(
+    r"(?P<email>[^@\s]+@[^@\s]+)"
+    r"|(?P<domain>[a-z0-9.-]+\.[a-z]{2,})"
+    r"|(?P<tag>[a-z0-9_-]+)"
+)
+_ALIAS_REQUIRED = frozenset(("user_id", "domain"))
+_ALIAS_CANDIDATES = 5
+_ALIAS_BULK_MAX = 500
+_ALIAS_STREAM_CHUNK = 500
+
+_ALIAS_LIST_COLUMNS = select(
+    Alias.id,
+    Alias.alias_email,
+    Alias.site_name,
+    Alias.generated_password,
+    Alias.group_name,
+    Alias.created_at,
+)
+
+
+def _alias_candidates(user, raw_value):
+    """
+    Turn the user-supplied domain/email/tag into alias email candidates.
+    A single candidate is exactly what the user asked for; a domain yields
+    several random ones, any free one of which will do.
+    Returns (candidates, None) on success or (None, (message, status)) on error.
+    """
+    if not isinstance(raw_value, str):
+        return None, ("domain must be a string", 400)
+    input_value = raw_value.strip().lower()
+
+    if not input_value:
+        return None, ("Input value cannot be empty", 400)
+
+    match = _ALIAS_CLASSIFIER.fullmatch(input_value)
+    if match is None:
+        if "@" in input_value:
+            return None, ("Invalid email address", 400)
+        if "." in input_value:
+            return None, ("Invalid domain", 400)
+        return None, ("Invalid tag", 400)
+
+    if match["email"]:
+        # --- SCENARIO 1: A full email address was provided ---
+        # e.g., "my.custom@example.com" OR "sambhav242005+github@gmail.com"
+        return [input_value], None
+
+    if match["domain"]:
+        # --- SCENARIO 2: Only a domain was provided ---
+        # e.g., "example.com" or "google.com"
+        domain = input_value
+        # One getrandom() call for all candidates; each gets 8 bytes (16 hex chars)
+        raw = os.urandom(8 * _ALIAS_CANDIDATES).hex()
+        return [f"{raw[i:i + 16]}@{domain}" for i in range(0, len(raw), 16)], None
+
+    # --- SCENARIO 3: A tag was provided ---
+    # e.g., "github", "netflix", "shopping"
+    if not user.email or "@" not in user.email:
+        # This requires the user.email field to be set in your User model!
+        return None, ("User has no base email for tagging", 400)
+
+    tag = input_value
+    # Split base email (e.g., "sambhav242005@gmail.com")
+    local_part, domain_part = user.email.split("@", 1)
+    # Create the +alias (e.g., "sambhav242005+github@gmail.com")
+    return [f"{local_part}+{tag}@{domain_part}"], None
+
+
+def _taken_aliases(candidates):
+    """One IN probe for every candidate instead of one query per attempt."""
+    return set(db.session.scalars(select(Alias.alias_email).where(Alias.alias_email.in_(candidates))))
+
+
+def _resolve_alias_email(user, raw_value):
+    """
+    Turn the user-supplied domain/email/tag into the final alias email.
+    Returns (candidate, None) on success or (None, (message, status)) on error.
+    """
+    candidates, error = _alias_candidates(user, raw_value)
+    if error:
+        return None, error
+    if len(candidates) == 1:
+        # Exact choice: the unique index reports a clash at commit time
+        return candidates[0], None
+
+    taken = _taken_aliases(candidates)
+    for candidate in candidates:
+        if candidate not in taken:
+            return candidate, None
+    return None, ("Unable to generate unique alias", 500)
 
 @alias_bp.route("/aliases", methods=["GET", "POST"])
 def manage_aliases():
     if request.method == "POST":
-        data = request.get_json()
-        if not data or "user_id" not in data or "domain" not in data:
-            return jsonify({"error": "user_id and domain/email/tag are required"}), 400
+        data, err = parse_json_or_400(_ALIAS_REQUIRED, "user_id and domain/email/tag are required")
+        if err:
+            return err
 
         user = User.query.get(data["user_id"])
         if not user:
             return jsonify({"error": "Invalid user_id"}), 400
 
-        input_value = data["domain"].strip().lower()
-        candidate = ""  # This will store the final alias email
-
-        if not input_value:
-             return jsonify({"error": "Input value cannot be empty"}), 400
-
-        if "@" in input_value:
-            # --- SCENARIO 1: A full email address was provided ---
-            # e.g., "my.custom@example.com" OR "sambhav242005+github@gmail.com"
-            candidate = input_value
-        
-        elif "." in input_value:
-            # --- SCENARIO 2: Only a domain was provided ---
-            # e.g., "example.com" or "google.com"
-            domain = input_value
-            for _ in range(5):
-                candidate = f"{secrets.token_hex(8)}@{domain}"
-                if not Alias.query.filter_by(alias_email=candidate).first():
-                    break
-            else:
-                return jsonify({"error": "Unable to generate unique alias"}), 500
-        
-        else:
-            # --- SCENARIO 3: A tag was provided ---
-            # e.g., "github", "netflix", "shopping"
-            if not user.email or "@" not in user.email:
-                # This requires the user.email field to be set in your User model!
-                return jsonify({"error": "User has no base email for tagging"}), 400
-            
-            tag = input_value
-            # Split base email (e.g., "sambhav242005@gmail.com")
-            local_part, domain_part = user.email.split("@", 1)
-            # Create the +alias (e.g., "sambhav242005+github@gmail.com")
-            candidate = f"{local_part}+{tag}@{domain_part}"
-
-        # --- Check for Duplicates ---
-        # This check now covers all three scenarios
-        if Alias.query.filter_by(alias_email=candidate).first():
-            return jsonify({"error": "This email alias is already taken"}), 409 # 409 Conflict
+        candidate, error = _resolve_alias_email(user, data["domain"])
+        if error:
+            message, status = error
+            return jsonify({"error": message}), status
 
         # --- Create the alias ---
         alias = Alias(
@@ -65,7 +129,13 @@ def manage_aliases():
             group_name=data.get("group_name"),
         )
         db.session.add(alias)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # --- Duplicate ---
+            # The unique index on alias_email covers all three scenarios
+            db.session.rollback()
+            return jsonify({"error": "This email alias is already taken"}), 409 # 409 Conflict
 
         return jsonify({
             "alias_id": alias.id,
@@ -74,21 +144,30 @@ def manage_aliases():
         }), 201
 
     # --- GET (List) ---
-    user_id = request.args.get("user_id")
-    if not user_id:
+    if not request.args.get("user_id"):
         return jsonify({"error": "user_id required"}), 400
+    user_id = request.args.get("user_id", type=int)
+    if user_id is None:
+        return jsonify({"error": "user_id must be an integer"}), 400
 
-    aliases = Alias.query.filter_by(user_id=user_id).all()
-    return jsonify([
-        {
-            "id": a.id,
-            "alias_email": a.alias_email,
-            "site_name": a.site_name,
-            "generated_password": a.generated_password,
-            "group_name": a.group_name,
-            "created_at": a.created_at.isoformat() if a.created_at else None
-        } for a in aliases
-    ])
+    # Select only the listed columns: rows come back as plain tuples, not ORM objects
+    stmt = _ALIAS_LIST_COLUMNS.where(Alias.user_id == user_id).execution_options(
+        stream_results=True, yield_per=_ALIAS_STREAM_CHUNK
+    )
+
+    def generate():
+        # Encode and send one chunk of rows at a time so memory stays O(chunk)
+        yield b"["
+        first = True
+        for chunk in db.session.execute(stmt).partitions():
+            body = orjson.dumps([r._asdict() for r in chunk])[1:-1]
+            if not body:
+                continue
+            yield body if first else b"," + body
+            first = False
+        yield b"]"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
 
 @alias_bp.route("/aliases/<int:alias_id>", methods=["GET", "PUT", "DELETE"])
 def manage_single_alias(alias_id):
@@ -108,9 +187,9 @@ def manage_single_alias(alias_id):
 
     # --- PUT (Update) ---
     if request.method == "PUT":
-        data = request.get_json()
-        if not data:
-            return jsonify({"error": "No update data provided"}), 400
+        data, err = parse_json_or_400(message="No update data provided")
+        if err:
+            return err
 
         if "site_name" in data:
             alias.site_name = data["site_name"]
@@ -122,8 +201,105 @@ def manage_single_alias(alias_id):
 
     # --- DELETE ---
     if request.method == "DELETE":
+        # Existing databases have no ON DELETE clause on this reference, so
+        # detach correlations here instead of relying on the schema
+        db.session.execute(
+            update(IncidentCorrelation)
+            .where(IncidentCorrelation.alias_id == alias.id)
+            .values(alias_id=None)
+        )
         db.session.delete(alias)
         db.session.commit()
         return jsonify({"message": "Alias deleted successfully"}), 200
     
-    return jsonify({"error": "Method Not Allowed"}), 405
\ No newline at end of file
+    return jsonify({"error": "Method Not Allowed"}), 405
+
+
+@alias_bp.route("/aliases/bulk", methods=["POST"])
+def bulk_create_aliases():
+    """
+    Create many aliases in one transaction.
+    Body: JSON array of objects shaped like the POST /aliases payload.
+    All rows are inserted with a single executemany INSERT and one commit.
+    """
+    data, err = parse_json_list_or_400("A non-empty JSON array of aliases is required", _ALIAS_BULK_MAX)
+    if err:
+        return err
+
+    users = {}
+    resolved = []
+    for index, item in enumerate(data):
+        if not isinstance(item, dict) or not _ALIAS_REQUIRED.issubset(item):
+            return jsonify({"error": f"Item {index}: user_id and domain/email/tag are required"}), 400
+
+        user_id = item["user_id"]
+        if type(user_id) is not int:
+            return jsonify({"error": f"Item {index}: user_id must be an integer"}), 400
+        if user_id not in users:
+            users[user_id] = db.session.get(User, user_id)
+        user = users[user_id]
+        if not user:
+            return jsonify({"error": f"Item {index}: Invalid user_id"}), 400
+
+        candidates, error = _alias_candidates(user, item["domain"])
+        if error:
+            message, status = error
+            return jsonify({"error": f"Item {index}: {message}"}), status
+        resolved.append((user, item, candidates))
+
+    # One round-trip for every item's candidates instead of one per row
+    taken = _taken_aliases([c for _, _, candidates in resolved for c in candidates])
+    clashes = []
+    rows = []
+    seen = set()
+    for index, (user, item, candidates) in enumerate(resolved):
+        if len(candidates) == 1:
+            candidate = candidates[0]
+            if candidate in taken:
+                clashes.append(candidate)
+                continue
+            if candidate in seen:
+                return jsonify({"error": f"Item {index}: Duplicate alias in request"}), 409
+        else:
+            candidate = next((c for c in candidates if c not in taken and c not in seen), None)
+            if candidate is None:
+                return jsonify({"error": f"Item {index}: Unable to generate unique alias"}), 500
+        seen.add(candidate)
+
+        rows.append({
+            "user_id": user.id,
+            "alias_email": candidate,
+            "generated_password": generate_random_password(),
+            "site_name": item.get("site_name"),
+            "group_name": item.get("group_name"),
+        })
+
+    if clashes:
+        return jsonify({"error": "These email aliases are already taken", "aliases": clashes}), 409
+
+    try:
+        # RETURNING with executemany is batched (insertmanyvalues); rows are
+        # matched back by the unique alias_email, not by position
+        alias_ids = {
+            email: alias_id
+            for alias_id, email in db.session.execute(
+                insert(Alias).returning(Alias.id, Alias.alias_email), rows
+            )
+        }
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "One or more email aliases are already taken"}), 409
+    except Exception:
+        db.session.rollback()
+        logger.exception("Error bulk inserting aliases")
+        return jsonify({"error": "Failed to create aliases"}), 500
+
+    return jsonify([
+        {
+            "alias_id": alias_ids[r["alias_email"]],
+            "alias_email": r["alias_email"],
+            "generated_password": r["generated_password"],
+        }
+        for r in rows
+    ]), 201
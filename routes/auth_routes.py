@@ -1,32 +1,120 @@
-from flask import Blueprint, jsonify, request
-from werkzeug.security import generate_password_hash, check_password_hash
+import secrets
+from functools import cache
+from flask import Blueprint, jsonify
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 from models import db, User
+from utils import parse_json_or_400
+
+# New hashes are Argon2id; PBKDF2 hashes from before are still verified
+_ARGON2 = PasswordHasher(time_cost=2, memory_cost=64 * 1024, parallelism=1)
 
 auth_bp = Blueprint("auth", __name__)
 
+_REGISTER_REQUIRED = frozenset(("username", "email", "password"))
+_LOGIN_REQUIRED = frozenset(("email", "password"))
+
+_UPSERT_INSERTS = {"sqlite": sqlite_insert, "postgresql": pg_insert}
+
+# Built once at import; only the bound email changes per request.
+# The unique index on email makes this a single index probe.
+_USER_BY_EMAIL = select(User.id, User.password_hash).where(User.email == bindparam("email"))
+
+
+def _hash_password(password):
+    return _ARGON2.hash(password)
+
+
+def _verify_password(stored_hash, password):
+    """
+    Check a password against an Argon2 or Werkzeug PBKDF2 hash.
+    Returns (matches, needs_rehash); matching PBKDF2 hashes are flagged for
+    rehashing so users migrate to Argon2 on their next login.
+    """
+    if stored_hash.startswith("$argon2"):
+        try:
+            _ARGON2.verify(stored_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False, False
+        return True, _ARGON2.check_needs_rehash(stored_hash)
+
+    matches = check_password_hash(stored_hash, password)
+    return matches, matches
+
+
+@cache
+def _dummy_password_hash():
+    """Hash compared against when the email is unknown; computed once per process."""
+    return _hash_password(secrets.token_urlsafe(16))
+
+
+def _insert_user(username, email, password_hash):
+    """
+    Insert a user and return its id, or None if the email is already registered.
+    Uses INSERT ... ON CONFLICT DO NOTHING RETURNING where supported so the
+    uniqueness check and the insert are a single atomic statement.
+    """
+    values = {"username": username, "email": email, "password_hash": password_hash}
+    dialect_insert = _UPSERT_INSERTS.get(db.engine.dialect.name)
+    if dialect_insert is None:
+        if db.session.scalar(select(User.id).where(User.email == email)) is not None:
+            return None
+        return db.session.execute(insert(User).values(**values).returning(User.id)).scalar_one()
+
+    stmt = (
+        dialect_insert(User)
+        .values(**values)
+        .on_conflict_do_nothing(index_elements=["email"])
+        .returning(User.id)
+    )
+    return db.session.execute(stmt).scalar()
+
 @auth_bp.route("/register", methods=["POST"])
 def register():
-    data = request.get_json()
-    if not data or not all(k in data for k in ("username", "email", "password")):
-        return jsonify({"error": "username, email, and password are required"}), 400
+    data, err = parse_json_or_400(_REGISTER_REQUIRED, "username, email, and password are required")
+    if err:
+        return err
 
-    if User.query.filter_by(email=data["email"]).first():
+    pw_hash = _hash_password(data["password"])
+    try:
+        user_id = _insert_user(data["username"], data["email"], pw_hash)
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "User with this username already exists"}), 400
+
+    if user_id is None:
+        db.session.rollback()
         return jsonify({"error": "User with this email already exists"}), 400
 
-    pw_hash = generate_password_hash(data["password"], method="pbkdf2:sha256", salt_length=16)
-    user = User(username=data["username"], email=data["email"], password_hash=pw_hash)
-    db.session.add(user)
     db.session.commit()
-    return jsonify({"message": "User registered!", "user_id": user.id}), 201
+    return jsonify({"message": "User registered!", "user_id": user_id}), 201
 
 @auth_bp.route("/login", methods=["POST"])
 def login():
-    data = request.get_json()
-    if not data or not all(k in data for k in ("email", "password")):
-        return jsonify({"error": "Email and password are required"}), 400
+    data, err = parse_json_or_400(_LOGIN_REQUIRED, "Email and password are required")
+    if err:
+        return err
+
+    user = db.session.execute(_USER_BY_EMAIL, {"email": data["email"]}).first()
+    if not user or not user.password_hash:
+        # Burn the same hashing work so unknown emails can't be told apart by timing
+        _verify_password(_dummy_password_hash(), data["password"])
+        return jsonify({"error": "Invalid email or password"}), 401
 
-    user = User.query.filter_by(email=data["email"]).first()
-    if not user or not check_password_hash(user.password_hash, data["password"]):
+    matches, needs_rehash = _verify_password(user.password_hash, data["password"])
+    if not matches:
         return jsonify({"error": "Invalid email or password"}), 401
 
+    if needs_rehash:
+        # One-shot migration of legacy PBKDF2 (or outdated Argon2) hashes
+        db.session.execute(
+            update(User).where(User.id == user.id).values(password_hash=_hash_password(data["password"]))
+        )
+        db.session.commit()
+
     return jsonify({"message": "Login successful!", "user_id": user.id}), 200
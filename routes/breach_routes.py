@@ -1,49 +1,55 @@
-from flask import Blueprint, jsonify, request
-from models import db, Leak, BreachReport, BreachStatus,BreachAction
-from utils import check_email_breach
+import logging
+from typing import List
+import msgspec
+from flask import Blueprint, jsonify
+from sqlalchemy import insert
+from models import db, Leak, BreachDetail, BreachReport, BreachStatus, BreachAction
+from utils import check_email_breach, parse_json_or_400
 
 breach_bp = Blueprint("breach", __name__)
+logger = logging.getLogger(__name__)
+
+_LEAK_CHECK_REQUIRED = frozenset(("email",))
 
 @breach_bp.route("/leak-check", methods=["POST"])
 def check_leak():
     try:
-        data = request.get_json(silent=True)
-        if not data or "email" not in data:
-            return jsonify({"error": "Email is required"}), 400
+        data, err = parse_json_or_400(_LEAK_CHECK_REQUIRED, "Email is required")
+        if err:
+            return err
 
-        email = data["email"].strip().lower()
         alias_id = data.get("alias_id")
 
-        result = check_email_breach(email)
+        # Normalized (and cached) by check_email_breach
+        result = check_email_breach(data["email"])
         if not result:
             return jsonify({"status": "ERROR", "message": "Unable to check breach status"}), 500
 
         if result.get("found") and result.get("breach_count", 0) > 0:
             details = result["breaches"]
+            names = [b.get("Name", "") for b in details]
 
             if alias_id:
                 try:
-                    names = [b.get("Name", "unknown") for b in details]
-                    source = ", ".join(names[:3])
-                    leak = Leak(alias_id=alias_id, breach_source=source)
-                    db.session.add(leak)
+                    source = ", ".join(n or "unknown" for n in names[:3])
+                    db.session.execute(insert(Leak).values(alias_id=alias_id, breach_source=source))
                     db.session.commit()
                 except Exception as e:
                     db.session.rollback()
-                    print(f"[DB ERROR] {e}")
+                    logger.warning("Failed to record leak for alias %s: %s", alias_id, e)
 
             report = BreachReport(
                 status=BreachStatus.COMPROMISED,
                 action=BreachAction.REPLACE_PASSWORD,
                 breach_count=result["breach_count"],
-                breaches=[b.get("Name", "") for b in details],
-                details=details
+                breaches=names,
+                details=msgspec.convert(details, List[BreachDetail])
             )
 
-            return jsonify(report.dict()), 200
+            return jsonify(msgspec.to_builtins(report)), 200
 
         return jsonify({"status": "SAFE", "message": "No breaches found"}), 200
     except Exception as e:
         db.session.rollback()
-        print(f"[ERROR] check_leak: {e}")
+        logger.exception("check_leak failed")
         return jsonify({"status": "ERROR", "message": str(e)}), 500
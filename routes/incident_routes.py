@@ -1,58 +1,63 @@
-from flask import Blueprint, jsonify, request
-from models import db, Leak, Session, SessionTab, IncidentCorrelation
-from utils import correlate_leak_to_session
+import logging
+import orjson
+from flask import Blueprint, Response, jsonify, request
+from sqlalchemy import insert
+from sqlalchemy.orm import selectinload
+from models import db, Leak, Session, IncidentCorrelation
+from utils import correlate_leak_to_session, parse_json_or_400, session_domains
 
 incident_bp = Blueprint("incident", __name__)
+logger = logging.getLogger(__name__)
+
+_CORRELATE_REQUIRED = frozenset(("leak_id",))
 
 
 @incident_bp.route("/correlate-incident", methods=["POST"])
 def correlate_incident():
     try:
-        data = request.get_json()
-        if not data or "leak_id" not in data:
-            return jsonify({"error": "leak_id is required"}), 400
+        data, err = parse_json_or_400(_CORRELATE_REQUIRED, "leak_id is required")
+        if err:
+            return err
 
         leak = Leak.query.get(data["leak_id"])
         if not leak:
             return jsonify({"error": "Leak not found"}), 404
 
-        user_id = leak.alias.user_id if leak.alias else None
+        alias = leak.alias
+        user_id = alias.user_id if alias else None
         if not user_id:
             return jsonify({"error": "Cannot determine user from leak"}), 400
 
-        sessions = Session.query.filter_by(user_id=user_id).all()
+        # Load every session's tabs in one extra query instead of one per session
+        sessions = Session.query.options(selectinload(Session.tabs)).filter_by(user_id=user_id).all()
         correlations = []
-        best_correlation = None
+        correlation_rows = []
+        best_session_id = None
         highest_confidence = 0.0
 
+        leak_info = {"breach_source": leak.breach_source, "detected_at": leak.detected_at}
+        alias_data = {
+            "id": alias.id,
+            "alias_email": alias.alias_email
+        }
+
         for session in sessions:
-            tabs = SessionTab.query.filter_by(session_id=session.id).all()
             session_data = {
                 "id": session.id,
                 "start_time": session.start_time,
-                "tabs": [{"url": tab.url} for tab in tabs]
+                "domains": session_domains(tab.url for tab in session.tabs),
             }
 
-            alias_data = {
-                "id": leak.alias.id,
-                "alias_email": leak.alias.alias_email
-            } if leak.alias_id else None
-
-            correlation_result = correlate_leak_to_session(
-                {"breach_source": leak.breach_source, "detected_at": leak.detected_at},
-                session_data,
-                alias_data
-            )
-
-            correlation = IncidentCorrelation(
-                leak_id=leak.id,
-                session_id=session.id,
-                alias_id=leak.alias_id,
-                correlation_confidence=correlation_result["confidence"],
-                correlation_factors=correlation_result["factors"]
-            )
-
-            db.session.add(correlation)
+            correlation_result = correlate_leak_to_session(leak_info, session_data, alias_data)
+
+            # Plain rows, not ORM objects: inserted together below
+            correlation_rows.append({
+                "leak_id": leak.id,
+                "session_id": session.id,
+                "alias_id": leak.alias_id,
+                "correlation_confidence": correlation_result["confidence"],
+                "correlation_factors": correlation_result["factors"],
+            })
             correlations.append({
                 "session_id": session.id,
                 "confidence": correlation_result["confidence"],
@@ -61,8 +66,11 @@ def correlate_incident():
 
             if correlation_result["confidence"] > highest_confidence:
                 highest_confidence = correlation_result["confidence"]
-                best_correlation = correlation
+                best_session_id = session.id
 
+        if correlation_rows:
+            # One executemany INSERT instead of a unit-of-work flush per row
+            db.session.execute(insert(IncidentCorrelation), correlation_rows)
         db.session.commit()
 
         return jsonify({
@@ -70,13 +78,13 @@ def correlate_incident():
             "leak_id": leak.id,
             "correlations": correlations,
             "best_correlation": {
-                "session_id": best_correlation.session_id if best_correlation else None,
+                "session_id": best_session_id,
                 "confidence": highest_confidence,
             }
         }), 200
 
     except Exception as e:
-        print(f"[ERROR] correlate_incident(): {e}")
+        logger.exception("correlate_incident failed")
         return jsonify({"error": str(e)}), 500
 
 
@@ -93,7 +101,8 @@ def get_incident_correlations():
 
     correlations = query.all()
 
-    return jsonify([
+    # Encode directly with orjson (datetimes natively) and skip the jsonify layer
+    body = orjson.dumps([
         {
             "id": c.id,
             "leak_id": c.leak_id,
@@ -101,20 +110,21 @@ def get_incident_correlations():
             "alias_id": c.alias_id,
             "correlation_confidence": c.correlation_confidence,
             "correlation_factors": c.correlation_factors,
-            "correlated_at": c.correlated_at.isoformat() if c.correlated_at else None,
+            "correlated_at": c.correlated_at,
             "is_resolved": c.is_resolved,
             "resolution_notes": c.resolution_notes,
         }
         for c in correlations
-    ]), 200
+    ])
+    return Response(body, status=200, mimetype="application/json")
 
 
 @incident_bp.route("/incident-correlations/<int:correlation_id>", methods=["PUT"])
 def resolve_incident_correlation(correlation_id):
     correlation = IncidentCorrelation.query.get_or_404(correlation_id)
-    data = request.get_json()
-    if not data:
-        return jsonify({"error": "No data provided"}), 400
+    data, err = parse_json_or_400(message="No data provided")
+    if err:
+        return err
 
     correlation.is_resolved = data.get("is_resolved", False)
     correlation.resolution_notes = data.get("resolution_notes")
@@ -1,85 +1,201 @@
 
-from flask import Blueprint, jsonify, request
-from playwright.async_api import async_playwright
+import asyncio
+import hashlib
+import threading
+from flask import Blueprint, Response, jsonify, request
+from cachetools import TTLCache
 import uuid
-import os
 import base64
-import tempfile
-import shutil
-import json
+
+from browser_runtime import loop_submit, new_context, run_async
+from utils import parse_json_or_400
+
+# optional SIMD base64 encoder (same output as the stdlib one)
+try:
+    from pybase64 import b64encode_as_string as _b64encode_str
+except ImportError:
+    def _b64encode_str(data):
+        return base64.b64encode(data).decode("ascii")
 
 isolated_bp = Blueprint("isolated", __name__)
-browser_sessions = {}
 
-@isolated_bp.route("/start", methods=["GET"])
-async def start_isolated_session():
-    session_id = str(uuid.uuid4())
-    temp_dir = tempfile.mkdtemp(prefix=f"browser_session_{session_id}_")
-    
-    browser_sessions[session_id] = {
-        "temp_dir": temp_dir,
+MAX_ISOLATED_SESSIONS = 64
+ISOLATED_SESSION_TTL = 900  # seconds without activity before a session is closed
+
+_NAVIGATE_REQUIRED = frozenset(("session_id", "url"))
+_INTERACT_REQUIRED = frozenset(("session_id", "actions"))
+_CLOSE_REQUIRED = frozenset(("session_id",))
+
+VIEWPORT = {"width": 1280, "height": 720}
+# JPEG at this quality is 5-20x smaller than the default PNG and cheaper to encode
+SCREENSHOT_OPTIONS = {
+    "type": "jpeg",
+    "quality": 60,
+    "full_page": False,
+    "clip": {"x": 0, "y": 0, **VIEWPORT},
+}
+
+
+async def _graceful_close(session_id, session):
+    """Close the context of an evicted/closed session."""
+    # Only the session's context goes away; the shared browser stays up
+    if session.get("context"):
+        await session["context"].close()
+
+
+class _SessionCache(TTLCache):
+    """Bounded, idle-expiring session store that closes whatever it evicts."""
+
+    def popitem(self):
+        key, session = super().popitem()
+        print(f"[{key}] Evicting isolated session (capacity reached)")
+        loop_submit(_graceful_close(key, session))
+        return key, session
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        for key, session in expired:
+            print(f"[{key}] Evicting isolated session (idle timeout)")
+            loop_submit(_graceful_close(key, session))
+        return expired
+
+
+# Playwright objects are bound to the event loop that created them, so every
+# coroutine below runs on the shared session loop via run_async; the cache
+# itself is touched from request threads and guarded by a thread lock.
+browser_sessions = _SessionCache(maxsize=MAX_ISOLATED_SESSIONS, ttl=ISOLATED_SESSION_TTL)
+_sessions_lock = threading.Lock()
+
+
+def _get_session(session_id):
+    """Return a live session and refresh its idle timer, or None."""
+    with _sessions_lock:
+        browser_sessions.expire()
+        session = browser_sessions.get(session_id)
+        if session is not None:
+            browser_sessions[session_id] = session
+        return session
+
+
+def _screenshot_fields(session, screenshot, client_etag):
+    """
+    Remember the latest screenshot on the session and build the response
+    fields for it. When the client already holds this exact frame (it sent
+    back the etag we gave it last time) the image bytes are left out.
+    Called from the request thread, not the session loop, so hashing and
+    base64-encoding a frame never stall other sessions' coroutines.
+    """
+    etag = hashlib.blake2b(screenshot, digest_size=16).hexdigest()
+    session["screenshot"] = screenshot
+    session["screenshot_etag"] = etag
+    if client_etag == etag:
+        return {"screenshot_etag": etag, "screenshot_unchanged": True}
+    screenshot_base64 = _b64encode_str(screenshot)
+    return {
+        "screenshot_etag": etag,
+        "screenshot": f"data:image/jpeg;base64,{screenshot_base64}",
+    }
+
+
+async def _gather_page_reads(*coros):
+    """
+    Run independent Playwright reads concurrently instead of one CDP round
+    trip after another. If one fails the others are cancelled so a broken
+    page doesn't leave pending protocol calls behind.
+    """
+    tasks = [asyncio.ensure_future(c) for c in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def _start_session(session_id):
+    # Same Chromium as the streamed sessions (launched, recycled and shut
+    # down by browser_runtime); each isolated session only gets a context
+    print(f"[{session_id}] Creating browser context...")
+    context = await new_context(
+        viewport=VIEWPORT,
+        ignore_https_errors=True
+    )
+
+    print(f"[{session_id}] Creating new page...")
+    page = await context.new_page()
+
+    # ✅ DEBUG: Check if the page object is valid
+    if page is None:
+        raise Exception("Playwright's context.new_page() returned None")
+
+    return {
         "active": True,
-        "playwright": None,
-        "context": None,
-        "page": None,
-        "current_url": None
+        "context": context,
+        "page": page,
+        "current_url": None,
+        "screenshot": None,
+        "screenshot_etag": None,
+        # Serializes navigate/interact calls on the same page
+        "lock": asyncio.Lock(),
     }
-    
+
+
+@isolated_bp.route("/start", methods=["GET"])
+def start_isolated_session():
+    session_id = str(uuid.uuid4())
+
     try:
-        print(f"[{session_id}] Starting Playwright...")
-        playwright = await async_playwright().start()
-        
-        print(f"[{session_id}] Launching persistent context...")
-        context = await playwright.chromium.launch_persistent_context(
-            user_data_dir=temp_dir,
-            headless=True,
-            args=["--no-sandbox", "--disable-setuid-sandbox"],
-            viewport={"width": 1280, "height": 720},
-            ignore_https_errors=True
-        )
-        
-        print(f"[{session_id}] Creating new page...")
-        page = await context.new_page()
-        
-        # ✅ DEBUG: Check if the page object is valid
-        if page is None:
-            raise Exception("Playwright's context.new_page() returned None")
-
-        print(f"[{session_id}] Storing objects in session. Page object type: {type(page)}")
-        browser_sessions[session_id]["playwright"] = playwright
-        browser_sessions[session_id]["context"] = context
-        browser_sessions[session_id]["page"] = page
-        
+        session = run_async(_start_session(session_id))
+
+        print(f"[{session_id}] Storing objects in session. Page object type: {type(session['page'])}")
+        with _sessions_lock:
+            browser_sessions[session_id] = session
+
         print(f"[{session_id}] Session started successfully.")
         return jsonify({
             "session_id": session_id,
             "message": "Isolated browser session started"
         }), 201
-        
+
     except Exception as e:
         print(f"[{session_id}] ERROR during startup: {str(e)}")
-        if session_id in browser_sessions:
-            shutil.rmtree(browser_sessions[session_id]["temp_dir"], ignore_errors=True)
-            del browser_sessions[session_id]
         return jsonify({"error": f"Failed to start browser: {str(e)}"}), 500
 
+
+async def _navigate(session, url):
+    async with session["lock"]:
+        page = session["page"]
+        await page.goto(url, wait_until="domcontentloaded", timeout=20000)
+
+        html_content, title, screenshot = await _gather_page_reads(
+            page.content(), page.title(), page.screenshot(**SCREENSHOT_OPTIONS)
+        )
+        session["current_url"] = url
+
+        return {
+            "html": html_content,
+            "title": title,
+            "url": page.url,
+        }, screenshot
+
+
 @isolated_bp.route("/navigate", methods=["POST"])
-async def navigate_to_url():
-    data = request.get_json()
-    if not data or "session_id" not in data or "url" not in data:
-        return jsonify({"error": "session_id and url are required"}), 400
-    
+def navigate_to_url():
+    data, err = parse_json_or_400(_NAVIGATE_REQUIRED, "session_id and url are required")
+    if err:
+        return err
+
     session_id = data["session_id"]
     url = data["url"]
-    
+
     print(f"--- [NAVIGATE] Request for session: {session_id} ---")
-    print(f"Active sessions: {list(browser_sessions.keys())}")
 
-    if session_id not in browser_sessions:
+    session = _get_session(session_id)
+    if session is None:
         print(f"[{session_id}] ERROR: Session ID not found in dictionary.")
         return jsonify({"error": "Invalid session"}), 404
 
-    session = browser_sessions[session_id]
     page = session.get("page")
 
     # ✅ DEBUG: Check the page object before using it
@@ -90,118 +206,120 @@ async def navigate_to_url():
 
     try:
         print(f"[{session_id}] Navigating to: {url}")
-        response = await page.goto(url, wait_until="domcontentloaded", timeout=20000)
-        
-        html_content = await page.content()
-        title = await page.title()
-        session["current_url"] = url
-        
-        screenshot = await page.screenshot()
-        screenshot_base64 = base64.b64encode(screenshot).decode("utf-8")
-        
+        result, screenshot = run_async(_navigate(session, url))
+        result.update(_screenshot_fields(session, screenshot, data.get("screenshot_etag")))
         print(f"[{session_id}] Navigation successful.")
-        return jsonify({
-            "html": html_content,
-            "title": title,
-            "url": page.url,
-            "screenshot": f"data:image/png;base64,{screenshot_base64}"
-        }), 200
-        
+        return jsonify(result), 200
+
     except Exception as e:
         print(f"[{session_id}] ERROR during navigation: {str(e)}")
         return jsonify({"error": f"Failed to navigate: {str(e)}"}), 500
 
 
-@isolated_bp.route("/interact", methods=["POST"])
-async def interact_with_page():  # <-- Changed to async def
-    """Process user interactions on the page and return updated HTML."""
-    data = request.get_json()
-    if not data or "session_id" not in data or "actions" not in data:
-        return jsonify({"error": "session_id and actions are required"}), 400
-    
-    session_id = data["session_id"]
-    actions = data["actions"]
-    
-    # Check if session exists
-    if session_id not in browser_sessions or not browser_sessions[session_id]["active"]:
-        return jsonify({"error": "Invalid or inactive session"}), 404
-    
-    try:
-        page = browser_sessions[session_id]["page"]
-        
+async def _interact(session, actions):
+    async with session["lock"]:
+        page = session["page"]
+
         # Process each action
         for action in actions:
             action_type = action.get("type")
-            
+
             if action_type == "click":
                 selector = action.get("selector")
                 if selector:
-                    await page.click(selector)  # <-- Use await
-            
+                    await page.click(selector)
+
             elif action_type == "type":
                 selector = action.get("selector")
                 text = action.get("text", "")
                 if selector:
-                    await page.fill(selector, text)  # <-- Use await
-            
+                    await page.fill(selector, text)
+
             elif action_type == "scroll":
                 x = action.get("x", 0)
                 y = action.get("y", 0)
-                await page.evaluate(f"window.scrollTo({x}, {y})") # <-- Use await
-            
+                await page.evaluate(f"window.scrollTo({x}, {y})")
+
             elif action_type == "keypress":
                 key = action.get("key")
                 if key:
-                    await page.keyboard.press(key) # <-- Use await
-        
+                    await page.keyboard.press(key)
+
         # Wait for any navigation or network activity to complete
-        await page.wait_for_load_state("domcontentloaded", timeout=5000) # <-- Use await
-        
-        # Get the updated HTML content
-        html_content = await page.content() # <-- Use await
-        
-        # Take a screenshot for reference (optional)
-        screenshot = await page.screenshot() # <-- Use await
-        screenshot_base64 = base64.b64encode(screenshot).decode("utf-8")
-        
-        return jsonify({
+        await page.wait_for_load_state("domcontentloaded", timeout=5000)
+
+        # Get the updated HTML content and a screenshot for reference
+        html_content, screenshot = await _gather_page_reads(
+            page.content(), page.screenshot(**SCREENSHOT_OPTIONS)
+        )
+
+        return {
             "html": html_content,
             "url": page.url,
-            "screenshot": f"data:image/png;base64,{screenshot_base64}"
-        }), 200
-        
+        }, screenshot
+
+
+@isolated_bp.route("/interact", methods=["POST"])
+def interact_with_page():
+    """Process user interactions on the page and return updated HTML."""
+    data, err = parse_json_or_400(_INTERACT_REQUIRED, "session_id and actions are required")
+    if err:
+        return err
+
+    session_id = data["session_id"]
+    actions = data["actions"]
+
+    # Check if session exists
+    session = _get_session(session_id)
+    if session is None or not session["active"]:
+        return jsonify({"error": "Invalid or inactive session"}), 404
+
+    try:
+        result, screenshot = run_async(_interact(session, actions))
+        result.update(_screenshot_fields(session, screenshot, data.get("screenshot_etag")))
+        return jsonify(result), 200
+
     except Exception as e:
         return jsonify({"error": f"Failed to process interaction: {str(e)}"}), 500
 
+
+@isolated_bp.route("/screenshot", methods=["GET"])
+def get_screenshot():
+    """Raw JPEG of the latest frame; honours If-None-Match with the returned ETag."""
+    session_id = request.args.get("session_id")
+    if not session_id:
+        return jsonify({"error": "session_id is required"}), 400
+
+    session = _get_session(session_id)
+    if session is None:
+        return jsonify({"error": "Invalid session"}), 404
+    if session["screenshot"] is None:
+        return jsonify({"error": "No screenshot yet; navigate first"}), 404
+
+    response = Response(session["screenshot"], mimetype="image/jpeg")
+    response.set_etag(session["screenshot_etag"])
+    return response.make_conditional(request)
+
+
 @isolated_bp.route("/close", methods=["POST"])
-async def close_session():  # <-- Changed to async def
+def close_session():
     """Close an isolated browser session and clean up resources."""
-    data = request.get_json()
-    if not data or "session_id" not in data:
-        return jsonify({"error": "session_id is required"}), 400
-    
+    data, err = parse_json_or_400(_CLOSE_REQUIRED, "session_id is required")
+    if err:
+        return err
+
     session_id = data["session_id"]
-    
-    if session_id not in browser_sessions:
+
+    # Remove session from active sessions
+    with _sessions_lock:
+        session = browser_sessions.pop(session_id, None)
+    if session is None:
         return jsonify({"error": "Invalid session"}), 404
-    
+
     try:
-        session = browser_sessions[session_id]
-        
-        # Close the context and stop playwright
-        if session.get("context"):
-            await session["context"].close()  # <-- Use await
-        if session.get("playwright"):
-            await session["playwright"].stop()  # <-- Use await
-        
-        # Clean up temporary directory
-        if session.get("temp_dir") and os.path.exists(session["temp_dir"]):
-            shutil.rmtree(session["temp_dir"], ignore_errors=True)
-        
-        # Remove session from active sessions
-        del browser_sessions[session_id]
-        
+        # Close the session's browser context
+        run_async(_graceful_close(session_id, session))
         return jsonify({"message": "Session closed successfully"}), 200
-        
+
     except Exception as e:
-        return jsonify({"error": f"Failed to close session: {str(e)}"}), 500
\ No newline at end of file
+        return jsonify({"error": f"Failed to close session: {str(e)}"}), 500
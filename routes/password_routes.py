@@ -1,15 +1,20 @@
-from flask import Blueprint, jsonify, request
+import logging
+import msgspec
+from flask import Blueprint, jsonify
 from models import PasswordBreachResponse,PasswordStatus
-from utils import check_hibp_api
+from utils import check_hibp_api, parse_json_or_400
 
 password_bp = Blueprint("password", __name__)
+logger = logging.getLogger(__name__)
+
+_CHECK_PASSWORD_REQUIRED = frozenset(("password",))
 
 @password_bp.route("/check-password", methods=["POST"])
 def check_password_pwned():
     try:
-        data = request.get_json(silent=True)
-        if not data or "password" not in data:
-            return jsonify({"error": "Password is required"}), 400
+        data, err = parse_json_or_400(_CHECK_PASSWORD_REQUIRED, "Password is required")
+        if err:
+            return err
 
         password = data["password"].strip()
         if not password:
@@ -28,7 +33,7 @@ def check_password_pwned():
                 message="This password was not found in the HIBP database.",
                 count=0
             )
-        return jsonify(response.dict()), 200
+        return jsonify(msgspec.to_builtins(response)), 200
     except Exception as e:
-        print(f"[ERROR] check_password_pwned: {e}")
+        logger.exception("check_password_pwned failed")
         return jsonify({"status": "ERROR", "message": str(e)}), 500
@@ -1,28 +1,30 @@
 # session_bp.py
 import asyncio
-import io
-import json
+import heapq
 import threading
 import time
 import uuid
-import base64
 import logging
+import os
 from datetime import datetime
 from typing import Dict, Any
 
-from flask import Blueprint, request, jsonify, render_template
+import orjson
+from flask import Blueprint, Response, request, jsonify, render_template
+
+from browser_runtime import close_drained_browsers, loop_alive, new_context, loop_submit, run_async, run_many
+from utils import parse_json_list_or_400, parse_json_or_400
 
 # optional DB models (safe import)
 try:
-    from models import db, Session as DBSession
+    from sqlalchemy import delete, insert, update
+    from models import db, Session as DBSession, SessionTab
     _HAS_DB = True
 except Exception:
     _HAS_DB = False
 
-from playwright.async_api import async_playwright
-from aiortc import RTCPeerConnection, RTCSessionDescription, VideoStreamTrack, RTCIceCandidate
-from av import VideoFrame
-from PIL import Image, ImageDraw
+# playwright, aiortc and av are imported where they're first needed, so
+# workers that only serve DB routes or /health never load them.
 
 # Configure logging
 logging.basicConfig(
@@ -37,131 +39,106 @@ session_bp = Blueprint("session", __name__)
 SESSION_TIMEOUT = 3600  # 1 hour
 IDLE_TIMEOUT = 1800     # 30 minutes
 CLEANUP_INTERVAL = 60   # 1 minute
+# How long request threads wait on the loop (the work is cancelled after)
+SESSION_CREATE_TIMEOUT = 45  # above page.goto's own 30 s, so that fires first
+OFFER_TIMEOUT = 10
+LIST_TIMEOUT = 3
+THUMBNAIL_TIMEOUT = 3
+MAX_BULK_TABS = 500  # items per /tabs/bulk request
 FPS = 15
 VIEWPORT_WIDTH = 1280
 VIEWPORT_HEIGHT = 720
 
 # In-memory stores (thread-safe)
-SESSIONS: Dict[str, Dict[str, Any]] = {}        # session_id -> {playwright,browser,context,page,url,created_at,last_activity}
+SESSIONS: Dict[str, Dict[str, Any]] = {}        # session_id -> {context,page,url,viewport,created_at,last_activity}
 PEER_CONNECTIONS: Dict[str, Dict[str, Any]] = {}  # pc_id -> {'pc': pc, 'session_id': session_id, 'created_at': ...}
 SAVED_SESSIONS: Dict[str, Dict[str, Any]] = {}  # saved_id -> saved_session_dict
-_lock = threading.Lock()
-
-# Persistent async loop in its own thread
-_loop = None
-
-def init_loop():
-    global _loop
-    _loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(_loop)
-    _loop.run_forever()
-
-threading.Thread(target=init_loop, daemon=True).start()
-time.sleep(0.05)
-
-def run_async(coro, timeout=30):
-    global _loop
-    if _loop is None:
-        raise RuntimeError("Async loop not initialized")
-    fut = asyncio.run_coroutine_threadsafe(coro, _loop)
-    return fut.result(timeout=timeout)
+# Single-key get/set/pop and list(d.items()) snapshots are atomic under the
+# GIL, so lookups, PEER_CONNECTIONS and per-session field updates (e.g.
+# last_activity) need no lock. _sessions_lock only covers SESSIONS
+# membership changes, which must stay in step with the expiry heap.
+_sessions_lock = threading.Lock()
+# (deadline, session_id) min-heap so cleanup only looks at sessions that are
+# due instead of scanning all of them; guarded by _sessions_lock
+_expiry_heap = []
+_failed_connections = 0  # only bumped on the loop thread
 
 # ----- Video track -----
-class BrowserVideoTrack(VideoStreamTrack):
-    def __init__(self, page, fps=None):
-        super().__init__()
-        self.page = page
-        self.fps = fps or FPS
-        self.frame_interval = 1.0 / self.fps
-        self._last = 0.0
-
-    async def recv(self):
-        pts, time_base = await self.next_timestamp()
-        now = time.time()
-        elapsed = now - self._last
-        if elapsed < self.frame_interval:
-            await asyncio.sleep(self.frame_interval - elapsed)
-        self._last = time.time()
-
-        try:
-            screenshot_bytes = await asyncio.wait_for(self.page.screenshot(type='png'), timeout=5.0)
-            img = Image.open(io.BytesIO(screenshot_bytes)).convert('RGB')
-            frame = VideoFrame.from_image(img)
-            frame.pts = pts
-            frame.time_base = time_base
-            return frame
-        except Exception as e:
-            logger.exception("Error generating frame")
-            img = Image.new('RGB', (VIEWPORT_WIDTH, VIEWPORT_HEIGHT), (255, 0, 0))
-            draw = ImageDraw.Draw(img)
-            draw.text((10, 10), f"Error: {str(e)}", fill=(255, 255, 255))
-            frame = VideoFrame.from_image(img)
-            frame.pts = pts
-            frame.time_base = time_base
-            return frame
+SCREENCAST_QUALITY = 60
+# JPEG qualities for thumbnails (polled by the session list) and saved tabs
+THUMBNAIL_QUALITY = 40
+THUMBNAIL_MAX_AGE = 2  # seconds browsers may reuse a thumbnail
+THUMBNAIL_TTL = 0.5  # seconds a captured thumbnail is served to other requests
+# Saved-tab screenshots are kept with their (in-memory) saved entry and
+# never change, so browsers may keep them for a long time
+SAVED_THUMBNAIL_MAX_AGE = 86400
+SAVED_SCREENSHOT_QUALITY = 70
+# BrowserVideoTrack itself lives in video_track.py and is loaded on the first offer
 
 # ----- Playwright session creation / cleanup -----
+# The shared browser and the loop it runs on live in browser_runtime.py.
+# Installed once per context so each click only sends a one-line call
+# instead of having V8 parse and compile the whole function again.
+HIT_TEST_SCRIPT = """
+window.__sentinel_hitTest = (x, y) => {
+    const el = document.elementFromPoint(x, y);
+    if (!el) return { found: false, message: 'No element at position' };
+    const rect = el.getBoundingClientRect();
+    return { found:true, tagName: el.tagName, id: el.id||'', className: el.className||'', rect: {left: rect.left, top: rect.top, width: rect.width, height: rect.height} };
+};
+"""
+HIT_TEST_CALL = "(d) => window.__sentinel_hitTest(d.x, d.y)"
+
 async def create_browser_session_async(session_id, url="https://example.com"):
     logger.info(f"Creating browser session {session_id} -> {url}")
-    p = await async_playwright().start()
-    browser = await p.chromium.launch(
-        headless=True,
-        args=[
-            '--no-sandbox',
-            '--disable-setuid-sandbox',
-            '--disable-dev-shm-usage',
-            '--disable-blink-features=AutomationControlled',
-            '--disable-gpu',
-            '--no-first-run',
-            '--no-default-browser-check',
-            '--disable-web-security',
-            '--disable-features=VizDisplayCompositor',
-        ]
-    )
-
-    context = await browser.new_context(
+    context = await new_context(
         user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
         ignore_https_errors=True,
         java_script_enabled=True,
+        viewport={"width": VIEWPORT_WIDTH, "height": VIEWPORT_HEIGHT},
     )
-
-    page = await context.new_page()
-    await page.set_viewport_size({"width": VIEWPORT_WIDTH, "height": VIEWPORT_HEIGHT})
-    await page.set_extra_http_headers({'Accept-Language': 'en-US,en;q=0.9'})
-    await page.goto(url, wait_until='domcontentloaded', timeout=30000)
-    await asyncio.sleep(0.5)
-    await page.set_viewport_size({"width": VIEWPORT_WIDTH, "height": VIEWPORT_HEIGHT})
+    try:
+        await context.add_init_script(HIT_TEST_SCRIPT)
+
+        page = await context.new_page()
+        await page.set_extra_http_headers({'Accept-Language': 'en-US,en;q=0.9'})
+        await page.goto(url, wait_until='domcontentloaded', timeout=30000)
+    except BaseException:
+        # Failed or cancelled (caller timed out): don't leave the context open
+        await context.close()
+        raise
     logger.info(f"Browser session {session_id} created")
     return {
-        'playwright': p,
-        'browser': browser,
         'context': context,
         'page': page,
         'url': url,
+        'viewport': (VIEWPORT_WIDTH, VIEWPORT_HEIGHT),
         'created_at': time.time(),
         'last_activity': time.time(),
     }
 
 async def cleanup_session_async(session_id):
-    with _lock:
+    with _sessions_lock:
         session = SESSIONS.pop(session_id, None)
     if not session:
         return
     try:
         logger.info(f"Cleaning up session {session_id}")
+        # The shared browser stays up; only this session's context goes
         await session['context'].close()
-        await session['browser'].close()
-        await session['playwright'].stop()
         logger.info(f"Cleaned up {session_id}")
     except Exception:
         logger.exception("Error cleaning up session")
 
 # ----- WebRTC helpers -----
-async def setup_webrtc_connection(pc, session_id, offer_sdp, offer_type):
+async def setup_webrtc_connection(pc, session_id, offer_sdp, offer_type, pc_id=None):
     session = SESSIONS.get(session_id)
     if not session:
         raise ValueError("Session not found")
 
+    from aiortc import RTCSessionDescription
+    from .video_track import BrowserVideoTrack
+
     page = session['page']
     offer = RTCSessionDescription(sdp=offer_sdp, type=offer_type)
     await pc.setRemoteDescription(offer)
@@ -179,17 +156,14 @@ async def setup_webrtc_connection(pc, session_id, offer_sdp, offer_type):
 
     @pc.on("connectionstatechange")
     async def on_connectionstatechange():
+        global _failed_connections
         state = pc.connectionState
         logger.info(f"Connection state: {state}")
         if state in ("failed", "closed"):
-            pc_id = None
-            with _lock:
-                for pid, entry in list(PEER_CONNECTIONS.items()):
-                    if entry['pc'] == pc:
-                        pc_id = pid
-                        break
-                if pc_id:
-                    del PEER_CONNECTIONS[pc_id]
+            if state == "failed":
+                _failed_connections += 1
+            if pc_id is not None:
+                PEER_CONNECTIONS.pop(pc_id, None)
             await pc.close()
 
     answer = await pc.createAnswer()
@@ -199,24 +173,44 @@ async def setup_webrtc_connection(pc, session_id, offer_sdp, offer_type):
 async def add_ice_candidate_async(pc, candidate_data):
     if isinstance(candidate_data, dict) and 'candidate' in candidate_data:
         try:
+            from aiortc import RTCIceCandidate
             candidate = RTCIceCandidate(**candidate_data)
             await pc.addIceCandidate(candidate)
         except Exception:
             logger.exception("Failed to add ICE candidate")
 
+# Datachannel messages stay text frames (the client JSON.parses event.data),
+# so orjson output is decoded to str; fixed replies are encoded once.
+def _dumps(obj):
+    return orjson.dumps(obj).decode()
+
+_ACK_TYPE = _dumps({'type': 'ack', 'event': 'type'})
+_ACK_SCROLL = _dumps({'type': 'ack', 'event': 'scroll'})
+_ACK_NAVIGATE = _dumps({'type': 'ack', 'event': 'navigate'})
+_INTERNAL_ERROR = _dumps({'type': 'error', 'message': 'internal error'})
+# click_response replies have a fixed shape, so only the dynamic values go
+# through the encoder instead of building and serialising a dict per click
+_CLICK_OK = '{"type":"click_response","success":true,"clickId":%s,"element":%s}'
+_CLICK_ERR = '{"type":"click_response","success":false,"error":%s,"clickId":%s}'
+
+def _click_ok(click_id, element):
+    return _CLICK_OK % (_dumps(click_id), _dumps(element))
+
+def _click_err(click_id, error):
+    return _CLICK_ERR % (_dumps(error), _dumps(click_id))
+
+def _write_file(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
 # ----- Interaction handler (ported from your original) -----
 async def handle_interaction(message, session_id, channel):
     try:
-        data = json.loads(message)
+        data = orjson.loads(message)
         session = SESSIONS.get(session_id)
         if not session:
             if channel and getattr(channel, "readyState", None) == "open":
-                channel.send(json.dumps({
-                    'type': 'click_response',
-                    'success': False,
-                    'error': 'Session not found',
-                    'clickId': data.get('id', 'unknown')
-                }))
+                channel.send(_click_err(data.get('id', 'unknown'), 'Session not found'))
             return
 
         session['last_activity'] = time.time()
@@ -231,114 +225,134 @@ async def handle_interaction(message, session_id, channel):
             y = int(data['y'])
 
             try:
+                # Resolves locally when the page is already loaded (no CDP round-trip)
                 await page.wait_for_load_state('domcontentloaded', timeout=5000)
-                await page.set_viewport_size({"width": 1280, "height": 720})
-                viewport = page.viewport_size
-                if not viewport:
-                    error_msg = "Failed to get viewport size"
-                    if channel and getattr(channel, "readyState", None) == "open":
-                        channel.send(json.dumps({'type': 'click_response','success': False,'error': error_msg,'clickId': click_id}))
-                    return
-                vw, vh = viewport['width'], viewport['height']
+                # Fixed at context creation, so no need to reset/query it per click
+                vw, vh = session['viewport']
                 if x < 0 or x > vw or y < 0 or y > vh:
                     error_msg = f"Coordinates ({x},{y}) outside viewport ({vw}x{vh})"
                     if channel and getattr(channel, "readyState", None) == "open":
-                        channel.send(json.dumps({'type': 'click_response','success': False,'error': error_msg,'clickId': click_id}))
+                        channel.send(_click_err(click_id, error_msg))
                     return
 
-                element_info = await page.evaluate("""
-                    (data) => {
-                        const x = data.x, y = data.y;
-                        const el = document.elementFromPoint(x, y);
-                        if (!el) return { found: false, message: 'No element at position' };
-                        const rect = el.getBoundingClientRect();
-                        return { found:true, tagName: el.tagName, id: el.id||'', className: el.className||'', rect: {left: rect.left, top: rect.top, width: rect.width, height: rect.height} };
-                    }
-                """, {"x": x, "y": y})
+                try:
+                    element_info = await page.evaluate(HIT_TEST_CALL, {"x": x, "y": y})
+                except Exception:
+                    # Document created before the init script (e.g. about:blank): install and retry
+                    await page.evaluate(HIT_TEST_SCRIPT)
+                    element_info = await page.evaluate(HIT_TEST_CALL, {"x": x, "y": y})
 
                 if not element_info.get('found'):
                     if channel and getattr(channel, "readyState", None) == "open":
-                        channel.send(json.dumps({'type': 'click_response','success': False,'error': 'No element found','clickId': click_id}))
+                        channel.send(_click_err(click_id, 'No element found'))
                     return
 
                 try:
-                    await page.mouse.move(x, y)
-                    await asyncio.sleep(0.05)
+                    # mouse.click already moves the pointer there first; a real
+                    # CDP input event (unlike a JS dispatchEvent) is isTrusted,
+                    # so focus, default actions and click handlers all behave
                     await page.mouse.click(x, y, button='left', click_count=1)
                     if channel and getattr(channel, "readyState", None) == "open":
-                        channel.send(json.dumps({'type':'click_response','success': True,'clickId': click_id,'element': element_info}))
+                        channel.send(_click_ok(click_id, element_info))
                 except Exception as click_error:
                     if channel and getattr(channel, "readyState", None) == "open":
-                        channel.send(json.dumps({'type':'click_response','success': False,'error': str(click_error),'clickId': click_id}))
+                        channel.send(_click_err(click_id, str(click_error)))
             except Exception as e:
                 logger.exception("Error in click handler")
                 if channel and getattr(channel, "readyState", None) == "open":
-                    channel.send(json.dumps({'type':'click_response','success': False,'error': str(e),'clickId': click_id}))
+                    channel.send(_click_err(click_id, str(e)))
 
         elif event_type == 'type':
             await page.keyboard.type(data.get('text', ''))
             if channel and getattr(channel, "readyState", None) == "open":
-                channel.send(json.dumps({'type': 'ack', 'event': 'type'}))
+                channel.send(_ACK_TYPE)
 
         elif event_type == 'scroll':
             delta_y = int(data.get('deltaY', 0))
             await page.evaluate(f"window.scrollBy(0, {delta_y})")
             if channel and getattr(channel, "readyState", None) == "open":
-                channel.send(json.dumps({'type':'ack','event':'scroll'}))
+                channel.send(_ACK_SCROLL)
 
         elif event_type == 'navigate':
             url = data.get('url')
             await page.goto(url, wait_until='domcontentloaded')
             session['url'] = url
             if channel and getattr(channel, "readyState", None) == "open":
-                channel.send(json.dumps({'type':'ack','event':'navigate'}))
+                channel.send(_ACK_NAVIGATE)
 
         elif event_type == 'screenshot':
-            screenshot = await page.screenshot(type='png')
-            filename = f"session_{session_id}_{int(time.time())}.png"
-            with open(filename, 'wb') as f:
-                f.write(screenshot)
+            screenshot = await page.screenshot(type='jpeg', quality=SAVED_SCREENSHOT_QUALITY)
+            filename = f"session_{session_id}_{int(time.time())}.jpg"
+            # File I/O on a worker thread so the loop (and every stream on it) keeps going
+            await asyncio.to_thread(_write_file, filename, screenshot)
             if channel and getattr(channel, "readyState", None) == "open":
-                channel.send(json.dumps({'type': 'screenshot_saved', 'filename': filename}))
+                channel.send(_dumps({'type': 'screenshot_saved', 'filename': filename}))
 
     except Exception:
         logger.exception("Error handling interaction")
         try:
             if channel and getattr(channel, "readyState", None) == "open":
-                channel.send(json.dumps({'type':'error','message':'internal error'}))
+                channel.send(_INTERNAL_ERROR)
         except Exception as e:
             logger.warning(f"Error sending error message: {e}")
 
 # ----- Cleanup task -----
+def _session_deadline(sess):
+    return min(sess['created_at'] + SESSION_TIMEOUT,
+               sess.get('last_activity', sess['created_at']) + IDLE_TIMEOUT)
+
+def _register_session(session_id, session):
+    """Add a live session and schedule its expiry check."""
+    with _sessions_lock:
+        SESSIONS[session_id] = session
+        heapq.heappush(_expiry_heap, (_session_deadline(session), session_id))
+
+def _pop_expired(now):
+    """Pop due heap entries; returns (expired session ids, next due time or None).
+
+    Activity only bumps last_activity, so an entry can be stale: when its
+    session turns out to still be within its deadline it's pushed back with
+    the new one. Entries for sessions deleted meanwhile are just dropped.
+    """
+    expired = []
+    with _sessions_lock:
+        while _expiry_heap and _expiry_heap[0][0] <= now:
+            _, sid = heapq.heappop(_expiry_heap)
+            sess = SESSIONS.get(sid)
+            if sess is None:
+                continue
+            deadline = _session_deadline(sess)
+            if deadline > now:
+                heapq.heappush(_expiry_heap, (deadline, sid))
+            else:
+                expired.append(sid)
+        next_due = _expiry_heap[0][0] if _expiry_heap else None
+    return expired, next_due
+
 async def cleanup_old_sessions():
-    """Background task to clean up old sessions and peer connections."""
+    """Background task to clean up expired and idle sessions."""
     while True:
+        next_due = None
         try:
-            now = time.time()
-            to_cleanup = []
-            with _lock:
-                for sid, sess in list(SESSIONS.items()):
-                    age = now - sess['created_at']
-                    idle = now - sess.get('last_activity', sess['created_at'])
-                    if age > SESSION_TIMEOUT or idle > IDLE_TIMEOUT:
-                        to_cleanup.append(sid)
-            for sid in to_cleanup:
+            expired, next_due = _pop_expired(time.time())
+            for sid in expired:
                 logger.info(f"Auto-cleanup {sid}")
                 await cleanup_session_async(sid)
+            await close_drained_browsers()
 
-            with _lock:
-                dead = [pcid for pcid, entry in PEER_CONNECTIONS.items() if entry['pc'].connectionState in ('failed','closed')]
-                for pcid in dead:
-                    del PEER_CONNECTIONS[pcid]
+            # Dead peer connections remove themselves in on_connectionstatechange,
+            # so there is nothing to scan for here
         except Exception:
             logger.exception("Error in cleanup loop")
-        await asyncio.sleep(CLEANUP_INTERVAL)
+        # Wake when the earliest session is due, but at least every
+        # CLEANUP_INTERVAL so retired browsers still get closed
+        delay = CLEANUP_INTERVAL
+        if next_due is not None:
+            delay = min(delay, max(0.0, next_due - time.time()))
+        await asyncio.sleep(delay)
 
-# start cleanup
-try:
-    run_async(cleanup_old_sessions())
-except Exception:
-    pass
+# start cleanup (runs forever, so schedule it rather than waiting on it)
+loop_submit(cleanup_old_sessions())
 
 # ----- Routes (match original / endpoints exactly) -----
 
@@ -360,9 +374,8 @@ def create_session():
     session_id = str(uuid.uuid4())
 
     try:
-        session = run_async(create_browser_session_async(session_id, url))
-        with _lock:
-            SESSIONS[session_id] = session
+        session = run_async(create_browser_session_async(session_id, url), timeout=SESSION_CREATE_TIMEOUT)
+        _register_session(session_id, session)
 
         # Optionally create DB record if models available (non-fatal)
         if _HAS_DB:
@@ -401,7 +414,7 @@ def delete_session(session_id):
 @session_bp.route("/sessions", methods=["GET"])
 def list_sessions():
     """List all active browser sessions.
-    
+
     Returns:
         tuple: ({"sessions": [list_of_sessions]}, 200)
         
@@ -411,51 +424,100 @@ def list_sessions():
         - title: Page title
         - created_at: ISO timestamp of creation
         - last_activity: ISO timestamp of last activity
-        - screenshot: Base64 encoded screenshot (optional)
         - is_isolated: Always True for this implementation
         - status: Always 'active'
+
+    Thumbnails are served separately by /sessions/<session_id>/thumbnail.jpg.
     """
+    sessions = list(SESSIONS.items())
+
+    # Titles for every session in one batch on the loop
+    try:
+        titles = run_many([sess['page'].title() for _, sess in sessions],
+                          timeout=LIST_TIMEOUT, return_exceptions=True) if sessions else []
+    except TimeoutError:
+        # A wedged page shouldn't take the whole listing down with it
+        logger.warning("Timed out reading session titles")
+        titles = [None] * len(sessions)
+
     out = []
-    with _lock:
-        for sid, sess in SESSIONS.items():
-            try:
-                title = run_async(sess['page'].title())
-            except Exception:
-                title = "unknown"
-            screenshot_b64 = None
-            try:
-                sb = run_async(sess['page'].screenshot(type='png', full_page=False))
-                screenshot_b64 = base64.b64encode(sb).decode('utf-8') if sb else None
-            except Exception:
-                pass
-            out.append({
-                'session_id': sid,
-                'url': sess.get('url'),
-                'title': title,
-                'created_at': datetime.utcfromtimestamp(sess['created_at']).isoformat() + 'Z',
-                'last_activity': datetime.utcfromtimestamp(sess.get('last_activity', sess['created_at'])).isoformat() + 'Z',
-                'screenshot': screenshot_b64,
-                'is_isolated': True,
-                'status': 'active'
-            })
+    for (sid, sess), title in zip(sessions, titles):
+        if title is None or isinstance(title, BaseException):
+            title = "unknown"
+        out.append({
+            'session_id': sid,
+            'url': sess.get('url'),
+            'title': title,
+            'created_at': datetime.utcfromtimestamp(sess['created_at']).isoformat() + 'Z',
+            'last_activity': datetime.utcfromtimestamp(sess.get('last_activity', sess['created_at'])).isoformat() + 'Z',
+            'is_isolated': True,
+            'status': 'active'
+        })
     return jsonify({'sessions': out}), 200
 
+async def get_thumbnail(session):
+    """JPEG thumbnail of a session's page, shared between concurrent callers.
+
+    A capture younger than THUMBNAIL_TTL is reused, and callers arriving
+    while one is in flight await that same capture instead of starting
+    another screenshot. Only ever runs on the loop thread, so the session
+    keys need no locking.
+    """
+    cached = session.get('thumbnail')
+    if cached is not None and time.monotonic() - cached[0] < THUMBNAIL_TTL:
+        return cached[1]
+    task = session.get('thumbnail_task')
+    if task is None:
+        task = asyncio.ensure_future(_capture_thumbnail(session))
+        session['thumbnail_task'] = task
+    # shield: one caller timing out mustn't cancel the capture for the rest
+    return await asyncio.shield(task)
+
+async def _capture_thumbnail(session):
+    try:
+        data = await session['page'].screenshot(type='jpeg', quality=THUMBNAIL_QUALITY, full_page=False)
+        session['thumbnail'] = (time.monotonic(), data)
+        return data
+    finally:
+        session['thumbnail_task'] = None
+
+def _jpeg_response(data):
+    response = Response(data, mimetype='image/jpeg')
+    response.cache_control.max_age = THUMBNAIL_MAX_AGE
+    return response
+
+@session_bp.route("/sessions/<session_id>/thumbnail.jpg", methods=["GET"])
+def session_thumbnail(session_id):
+    """Raw JPEG thumbnail of a live session's current viewport."""
+    sess = SESSIONS.get(session_id)
+    if not sess:
+        return jsonify({'error': 'Session not found'}), 404
+    try:
+        thumbnail = run_async(get_thumbnail(sess), timeout=THUMBNAIL_TIMEOUT)
+    except Exception:
+        logger.exception("Error capturing session thumbnail")
+        return jsonify({'error': 'failed to capture thumbnail'}), 500
+    return _jpeg_response(thumbnail)
+
 @session_bp.route("/sessions/<session_id>/save", methods=["POST"])
 def save_session(session_id):
     try:
-        with _lock:
-            sess = SESSIONS.get(session_id)
+        sess = SESSIONS.get(session_id)
         if not sess:
             return jsonify({'error': 'Session not found'}), 404
-        screenshot_bytes = run_async(sess['page'].screenshot(type='png'))
+        data = request.get_json(silent=True) or {}
+        title, screenshot_bytes = run_many([
+            sess['page'].title(),
+            sess['page'].screenshot(type='jpeg', quality=SAVED_SCREENSHOT_QUALITY),
+        ])
         saved_id = str(uuid.uuid4())
         saved = {
             'id': saved_id,
-            'name': request.json.get('name', sess.get('url')) if request.json else sess.get('url'),
+            'name': data.get('name', sess.get('url')),
             'url': sess.get('url'),
-            'title': run_async(sess['page'].title()),
+            'title': title,
             'saved_at': time.time(),
-            'screenshot': base64.b64encode(screenshot_bytes).decode('utf-8') if screenshot_bytes else None
+            'thumbnail': screenshot_bytes,
         }
         SAVED_SESSIONS[saved_id] = saved
         logger.info(f"Saved session {session_id} as {saved_id}")
@@ -464,13 +526,84 @@ def save_session(session_id):
         logger.exception("Error saving session")
         return jsonify({'error': 'failed to save session'}), 500
 
+@session_bp.route("/sessions/<int:session_id>/tabs/bulk", methods=["POST"])
+def bulk_add_tabs(session_id):
+    """Record many tabs for a stored (DB) session in one transaction.
+
+    Request body: [{"url": "...", "title": "...", "cookies": [...], "local_storage": {...}}, ...]
+    Response: {"status": "created", "count": n}
+    """
+    if not _HAS_DB:
+        return jsonify({'error': 'database not available'}), 503
+    data, err = parse_json_list_or_400('A non-empty JSON array of tabs is required', MAX_BULK_TABS)
+    if err:
+        return err
+    if db.session.get(DBSession, session_id) is None:
+        return jsonify({'error': 'Session not found'}), 404
+
+    rows = []
+    for index, tab in enumerate(data):
+        if not isinstance(tab, dict) or not tab.get('url'):
+            return jsonify({'error': f'Item {index}: url is required'}), 400
+        rows.append({
+            'session_id': session_id,
+            'url': tab['url'],
+            'title': tab.get('title'),
+            'cookies': tab.get('cookies'),
+            'local_storage': tab.get('local_storage'),
+        })
+
+    try:
+        db.session.execute(insert(SessionTab), rows)
+        db.session.commit()
+        return jsonify({'status': 'created', 'count': len(rows)}), 201
+    except Exception:
+        db.session.rollback()
+        logger.exception("Error bulk inserting tabs")
+        return jsonify({'error': 'failed to add tabs'}), 500
+
+@session_bp.route("/sessions/<int:session_id>/end", methods=["POST"])
+def end_db_session(session_id):
+    """Mark a stored (DB) session inactive and drop its recorded tabs.
+
+    Uses one UPDATE and one bulk DELETE instead of loading the session first.
+    Response: {"status": "ended", "session_id": id}
+    """
+    if not _HAS_DB:
+        return jsonify({'error': 'database not available'}), 503
+    try:
+        rows = db.session.execute(
+            update(DBSession).where(DBSession.id == session_id).values(active=False)
+        ).rowcount
+        if not rows:
+            db.session.rollback()
+            return jsonify({'error': 'Session not found'}), 404
+        db.session.execute(delete(SessionTab).where(SessionTab.session_id == session_id))
+        db.session.commit()
+        return jsonify({'status': 'ended', 'session_id': session_id}), 200
+    except Exception:
+        db.session.rollback()
+        logger.exception("Error ending session")
+        return jsonify({'error': 'failed to end session'}), 500
+
 @session_bp.route("/sessions/saved", methods=["GET"])
 def list_saved():
     out = []
     for sid, s in SAVED_SESSIONS.items():
-        out.append({'id': sid, 'name': s['name'], 'url': s['url'], 'title': s['title'], 'saved_at': s['saved_at'], 'screenshot': s.get('screenshot')})
+        out.append({'id': sid, 'name': s['name'], 'url': s['url'], 'title': s['title'], 'saved_at': s['saved_at']})
     return jsonify({'saved_tabs': out}), 200
 
+@session_bp.route("/sessions/saved/<saved_id>/thumbnail.jpg", methods=["GET"])
+def saved_thumbnail(saved_id):
+    saved = SAVED_SESSIONS.get(saved_id)
+    if not saved:
+        return jsonify({'error': 'Saved session not found'}), 404
+    # The screenshot never changes after saving, so its id is a valid ETag
+    response = Response(saved['thumbnail'], mimetype='image/jpeg')
+    response.set_etag(saved_id)
+    response.cache_control.max_age = SAVED_THUMBNAIL_MAX_AGE
+    return response.make_conditional(request)
+
 @session_bp.route("/sessions/<saved_id>/restore", methods=["POST"])
 def restore_saved(saved_id):
     try:
@@ -478,86 +611,113 @@ def restore_saved(saved_id):
         if not saved:
             return jsonify({'error': 'Saved session not found'}), 404
         session_id = str(uuid.uuid4())
-        sess = run_async(create_browser_session_async(session_id, saved['url']))
-        with _lock:
-            SESSIONS[session_id] = sess
+        sess = run_async(create_browser_session_async(session_id, saved['url']), timeout=SESSION_CREATE_TIMEOUT)
+        _register_session(session_id, sess)
         logger.info(f"Restored {saved_id} -> {session_id}")
         return jsonify({'status': 'restored', 'session_id': session_id, 'url': saved['url']}), 200
     except Exception:
         logger.exception("Error restoring saved session")
         return jsonify({'error': 'failed to restore saved session'}), 500
 
+# SDP offers are the largest bodies on the negotiation path; they're
+# decoded straight from the raw body with orjson by parse_json_or_400.
+_OFFER_REQUIRED = frozenset(('sdp', 'type', 'session_id'))
+_CANDIDATE_REQUIRED = frozenset(('pc_id', 'candidate'))
+
 @session_bp.route("/webrtc/offer", methods=["POST"])
 def handle_offer():
-    data = request.get_json() or {}
-    offer_sdp = data.get('sdp')
-    offer_type = data.get('type')
-    session_id = data.get('session_id')
+    data, err = parse_json_or_400(_OFFER_REQUIRED, 'Missing required fields')
+    if err:
+        return err
+    offer_sdp = data['sdp']
+    offer_type = data['type']
+    session_id = data['session_id']
     if not all([offer_sdp, offer_type, session_id]):
         return jsonify({'error': 'Missing required fields'}), 400
-    with _lock:
-        if session_id not in SESSIONS:
-            return jsonify({'error': 'Invalid session_id'}), 400
+    if session_id not in SESSIONS:
+        return jsonify({'error': 'Invalid session_id'}), 400
 
+    from aiortc import RTCPeerConnection
     pc = RTCPeerConnection()
     pc_id = str(uuid.uuid4())
-    with _lock:
-        PEER_CONNECTIONS[pc_id] = {'pc': pc, 'session_id': session_id, 'created_at': time.time()}
+    PEER_CONNECTIONS[pc_id] = {'pc': pc, 'session_id': session_id, 'created_at': time.time()}
 
     try:
-        answer_sdp, answer_type = run_async(setup_webrtc_connection(pc, session_id, offer_sdp, offer_type))
+        answer_sdp, answer_type = run_async(setup_webrtc_connection(pc, session_id, offer_sdp, offer_type, pc_id),
+                                            timeout=OFFER_TIMEOUT)
         return jsonify({'sdp': answer_sdp, 'type': answer_type, 'pc_id': pc_id}), 200
     except Exception:
         logger.exception("Error handling offer")
+        PEER_CONNECTIONS.pop(pc_id, None)
+        loop_submit(pc.close())
         return jsonify({'error': 'failed to handle offer'}), 500
 
 @session_bp.route("/webrtc/candidate", methods=["POST"])
 def handle_candidate():
-    data = request.get_json() or {}
-    pc_id = data.get('pc_id')
-    candidate = data.get('candidate')
+    data, err = parse_json_or_400(_CANDIDATE_REQUIRED, 'Missing pc_id or candidate')
+    if err:
+        return err
+    pc_id = data['pc_id']
+    candidate = data['candidate']
     if not pc_id or candidate is None:
         return jsonify({'error': 'Missing pc_id or candidate'}), 400
-    with _lock:
-        entry = PEER_CONNECTIONS.get(pc_id)
+    entry = PEER_CONNECTIONS.get(pc_id)
     if not entry:
         return jsonify({'status': 'ignored'}), 200
+    # add_ice_candidate_async logs its own failures and returns nothing, so
+    # there's no reason to park this worker thread until the loop gets to it
     try:
-        run_async(add_ice_candidate_async(entry['pc'], candidate))
-        return jsonify({'status': 'added'}), 200
+        loop_submit(add_ice_candidate_async(entry['pc'], candidate))
+        return jsonify({'status': 'queued'}), 202
     except Exception:
         logger.exception("Error adding candidate")
         return jsonify({'error': 'failed to add candidate'}), 500
 
 @session_bp.route("/health", methods=["GET"])
 def health():
-    with _lock:
-        return jsonify({
-            'status': 'healthy',
-            'sessions': len(SESSIONS),
-            'connections': len(PEER_CONNECTIONS),
-            'saved_sessions': len(SAVED_SESSIONS),
-            'async_thread_alive': _loop is not None and _loop.is_running()
-        }), 200
+    return jsonify({
+        'status': 'healthy',
+        'sessions': len(SESSIONS),
+        'connections': len(PEER_CONNECTIONS),
+        'failed_connections': _failed_connections,
+        'saved_sessions': len(SAVED_SESSIONS),
+        'async_thread_alive': loop_alive()
+    }), 200
 
 # small convenience isolated session (keeps original template flavor)
+ISOLATED_TEMPLATE_STATE_DIR = "temp_sessions"
+_isolated_state_ready = False
+_isolated_state_lock = threading.Lock()
+
+async def _refresh_isolated_storage_state(storage_state_path):
+    if os.path.exists(storage_state_path):
+        context = await new_context(storage_state=storage_state_path)
+    else:
+        context = await new_context()
+    try:
+        page = await context.new_page()
+        await page.goto("http://127.0.0.1:5000/api/sessions/isolated_session_page")
+        await context.storage_state(path=storage_state_path)
+    finally:
+        await context.close()
+
+def _ensure_isolated_storage_state():
+    """Produce storage_state.json once per process using the shared browser,
+    rather than launching a whole sync Chromium on every page view."""
+    global _isolated_state_ready
+    if _isolated_state_ready:
+        return
+    with _isolated_state_lock:
+        if _isolated_state_ready:
+            return
+        os.makedirs(ISOLATED_TEMPLATE_STATE_DIR, exist_ok=True)
+        storage_state_path = os.path.join(ISOLATED_TEMPLATE_STATE_DIR, "storage_state.json")
+        run_async(_refresh_isolated_storage_state(storage_state_path))
+        _isolated_state_ready = True
+
 @session_bp.route("/session/isolated_session", methods=["GET"])
 def isolated_session_template():
-    from playwright.sync_api import sync_playwright
-    import os
-    temp_dir = "temp_sessions"
-    os.makedirs(temp_dir, exist_ok=True)
-    storage_state_path = os.path.join(temp_dir, "storage_state.json")
-    with sync_playwright() as p:
-        browser = p.chromium.launch()
-        if os.path.exists(storage_state_path):
-            context = browser.new_context(storage_state=storage_state_path)
-        else:
-            context = browser.new_context()
-        page = context.new_page()
-        page.goto("http://127.0.0.1:5000/api/sessions/isolated_session_page")
-        context.storage_state(path=storage_state_path)
-        browser.close()
+    _ensure_isolated_storage_state()
     return render_template("isolated_session.html")
 
 @session_bp.route("/sessions/isolated_session_page", methods=["GET"])
@@ -0,0 +1,192 @@
+"""
+WebRTC video track for streamed browser sessions.
+
+Kept out of session_routes so aiortc and PyAV are only imported
+once a client actually asks for a stream.
+"""
+import asyncio
+import base64
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import av
+from aiortc import VideoStreamTrack
+from aiortc.mediastreams import VIDEO_CLOCK_RATE, VIDEO_TIME_BASE, MediaStreamError
+from av import VideoFrame
+from av.video.reformatter import VideoReformatter
+
+from .session_routes import FPS, SCREENCAST_QUALITY, VIEWPORT_HEIGHT, VIEWPORT_WIDTH
+
+logger = logging.getLogger(__name__)
+
+# Playwright objects are tied to the loop that created them, so pages can't be
+# spread across several loops. Instead the CPU-heavy part of each frame, the
+# JPEG decode, runs on this pool (FFmpeg releases the GIL), which keeps the
+# shared loop free and lets concurrent streams decode in parallel.
+_FRAME_DECODE_POOL = ThreadPoolExecutor(
+    max_workers=min(8, os.cpu_count() or 1), thread_name_prefix="frame-decode"
+)
+
+# Red in limited-range BT.601 YUV, written straight into the planes of the
+# placeholder frame sent while frames can't be produced (no RGB image and no
+# colorspace conversion). Each track keeps its own, since the sender sets pts on it.
+_ERROR_YUV = (81, 90, 240)
+
+
+def _error_frame():
+    frame = VideoFrame(width=VIEWPORT_WIDTH, height=VIEWPORT_HEIGHT, format='yuv420p')
+    for plane, value in zip(frame.planes, _ERROR_YUV):
+        plane.update(bytes((value,)) * plane.buffer_size)
+    return frame
+
+class BrowserVideoTrack(VideoStreamTrack):
+    """
+    Streams the page via CDP Page.startScreencast: Chromium pushes JPEG
+    frames only when the page repaints, and they're decoded straight into
+    VideoFrames with FFmpeg's mjpeg decoder (no PNG encode, no PIL decode).
+
+    Output runs at a constant cadence with timestamps taken from the monotonic
+    clock (immune to NTP steps). If the next frame is still decoding (or nothing has changed) the
+    last frame is repeated, so a slow capture lowers the effective frame
+    rate without skewing timing. Screencast frames are only acked once
+    picked up for decoding, which throttles Chromium to what we consume.
+    """
+
+    def __init__(self, page, fps=None):
+        super().__init__()
+        self.page = page
+        self.fps = fps or FPS
+        self.frame_interval = 1.0 / self.fps
+        self._clock_start = None
+        self._deadline = 0.0
+        self._cdp = None
+        self._decoder = av.CodecContext.create('mjpeg', 'r')
+        # frame.reformat() builds a fresh swscale context for every decoded
+        # frame; one reformatter per track keeps reusing the same context.
+        self._reformatter = VideoReformatter()
+        self._latest_jpeg_b64 = None
+        self._pending_acks = []
+        self._frame_ready = asyncio.Event()
+        self._decode_task = None
+        self._last_frame = None
+        self._error_frame = None
+
+    async def _start_screencast(self):
+        self._cdp = await self.page.context.new_cdp_session(self.page)
+        self._cdp.on('Page.screencastFrame', self._on_screencast_frame)
+        await self._cdp.send('Page.startScreencast', {
+            'format': 'jpeg',
+            'quality': SCREENCAST_QUALITY,
+            'maxWidth': VIEWPORT_WIDTH,
+            'maxHeight': VIEWPORT_HEIGHT,
+            'everyNthFrame': 1,
+        })
+
+    def _on_screencast_frame(self, params):
+        # Keep only the newest frame; older ones would just be dropped anyway.
+        # It stays base64 until a worker picks it up, so frames superseded
+        # before then are never decoded at all.
+        self._latest_jpeg_b64 = params['data']
+        self._pending_acks.append(params['sessionId'])
+        self._frame_ready.set()
+
+    async def _ack(self, screencast_session_ids):
+        try:
+            for screencast_session_id in screencast_session_ids:
+                await self._cdp.send('Page.screencastFrameAck', {'sessionId': screencast_session_id})
+        except Exception:
+            pass  # page/session already gone
+
+    def stop(self):
+        super().stop()
+        if self._cdp is not None:
+            cdp, self._cdp = self._cdp, None
+            asyncio.ensure_future(self._stop_screencast(cdp))
+
+    @staticmethod
+    async def _stop_screencast(cdp):
+        try:
+            await cdp.send('Page.stopScreencast')
+            await cdp.detach()
+        except Exception:
+            pass
+
+    def _decode(self, jpeg_b64):
+        # Runs on _FRAME_DECODE_POOL; one decode per track is in flight at a time.
+        # The mjpeg decoder yields full-range yuvj420p; converting to the
+        # encoder's yuv420p here means it happens once per new frame instead
+        # of inside the encoder for every repeat of it.
+        return [
+            self._reformatter.reformat(f, format='yuv420p')
+            for f in self._decoder.decode(av.Packet(base64.b64decode(jpeg_b64)))
+        ]
+
+    def _maybe_start_decode(self):
+        if self._decode_task is not None or self._latest_jpeg_b64 is None:
+            return
+        jpeg_b64, self._latest_jpeg_b64 = self._latest_jpeg_b64, None
+        self._frame_ready.clear()
+        acks, self._pending_acks = self._pending_acks, []
+        asyncio.ensure_future(self._ack(acks))
+        self._decode_task = asyncio.get_running_loop().run_in_executor(
+            _FRAME_DECODE_POOL, self._decode, jpeg_b64
+        )
+
+    def _collect_decode(self):
+        task, self._decode_task = self._decode_task, None
+        decoded = task.result()
+        if decoded:
+            self._last_frame = decoded[-1]
+
+    async def _first_frame(self):
+        while self._last_frame is None:
+            self._maybe_start_decode()
+            if self._decode_task is None:
+                await self._frame_ready.wait()
+                continue
+            # asyncio.wait doesn't cancel the decode if we time out meanwhile
+            await asyncio.wait({self._decode_task})
+            self._collect_decode()
+
+    async def _next_timestamp(self):
+        if self.readyState != "live":
+            raise MediaStreamError
+        now = time.monotonic()
+        if self._clock_start is None:
+            self._clock_start = self._deadline = now
+        else:
+            self._deadline += self.frame_interval
+            if self._deadline > now:
+                await asyncio.sleep(self._deadline - now)
+            elif now - self._deadline > self.frame_interval:
+                # Fell behind: skip the missed ticks rather than bursting to catch up
+                self._deadline = now
+        return int((time.monotonic() - self._clock_start) * VIDEO_CLOCK_RATE), VIDEO_TIME_BASE
+
+    async def recv(self):
+        pts, time_base = await self._next_timestamp()
+
+        try:
+            if self._cdp is None:
+                await self._start_screencast()
+            if self._last_frame is None:
+                await asyncio.wait_for(self._first_frame(), timeout=5.0)
+            else:
+                if self._decode_task is not None and self._decode_task.done():
+                    self._collect_decode()
+                self._maybe_start_decode()
+            frame = self._last_frame
+            frame.pts = pts
+            frame.time_base = time_base
+            return frame
+        except Exception:
+            # The error itself goes to the log; the viewer just gets a red frame
+            logger.exception("Error generating frame")
+            if self._error_frame is None:
+                self._error_frame = _error_frame()
+            frame = self._error_frame
+            frame.pts = pts
+            frame.time_base = time_base
+            return frame
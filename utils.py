@@ -1,34 +1,212 @@
 import secrets
 import string
-from openai import OpenAI
+from openai import DefaultHttpxClient, OpenAI
 import re
 from models import ChoiceLog
 from config import Config, config
-import json
-from playwright.sync_api import sync_playwright
 from urllib.parse import quote
 import hashlib
-from typing import Tuple,  Any
+import functools
+from typing import Tuple,  Any, Dict, Optional
 import sys
-import requests
-import csv
+import logging
+import httpx
+from cachetools import TTLCache
 import os
+import queue
+import threading
+from concurrent.futures import Future
+import time
+import atexit
+import orjson
+from flask import jsonify, request
+
+logger = logging.getLogger(__name__)
 
 # Provide a default user agent for requests usage
 DEFAULT_UA = "SentinelID/1.0 (+https://example.com) Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
 
-# Initialize OpenAI client with OpenRouter
+# Shared HTTP/2 client for HIBP: concurrent lookups from request threads
+# are multiplexed as streams on one pooled TLS connection instead of each
+# needing its own handshake.
+# Pool settings live on the transport: httpx ignores the Client-level
+# limits/http2 arguments when a transport is passed.
+_HIBP_CLIENT = httpx.Client(
+    headers={"User-Agent": DEFAULT_UA},
+    transport=httpx.HTTPTransport(
+        http2=True,
+        retries=2,
+        limits=httpx.Limits(max_keepalive_connections=16, max_connections=32),
+    ),
+)
+# Transient 429/5xx answers are retried on the pooled connection with a
+# short backoff rather than surfacing as a failed check.
+_HIBP_RETRY_STATUSES = frozenset((429, 502, 503, 504))
+_HIBP_RETRIES = 2
+
+
+def _hibp_get(url: str, headers: dict, timeout: float) -> httpx.Response:
+    for attempt in range(_HIBP_RETRIES + 1):
+        resp = _HIBP_CLIENT.get(url, headers=headers, timeout=timeout)
+        if resp.status_code not in _HIBP_RETRY_STATUSES or attempt == _HIBP_RETRIES:
+            return resp
+        time.sleep(0.2 * 2 ** attempt)
+    return resp
+
+
+# Range bodies are ~30 KB each, so the prefix cache is sized for memory, not hit rate
+_HIBP_RANGE_CACHE: TTLCache = TTLCache(maxsize=1024, ttl=24 * 3600)
+_BREACH_CACHE: TTLCache = TTLCache(maxsize=10_000, ttl=3600)
+_hibp_cache_lock = threading.Lock()
+# Lookups currently on the wire, keyed ("range", prefix) / ("email", email);
+# concurrent callers for the same key wait on the owner's future instead of
+# sending a duplicate request. Guarded by _hibp_cache_lock.
+_hibp_inflight: Dict[tuple, Future] = {}
+
+
+def _coalesced(key, fetch):
+    """Call fetch() once for all concurrent callers asking for the same key."""
+    with _hibp_cache_lock:
+        fut = _hibp_inflight.get(key)
+        owner = fut is None
+        if owner:
+            fut = _hibp_inflight[key] = Future()
+    if not owner:
+        return fut.result()
+    try:
+        result = fetch()
+    except BaseException as e:
+        fut.set_exception(e)
+        raise
+    else:
+        fut.set_result(result)
+        return result
+    finally:
+        with _hibp_cache_lock:
+            _hibp_inflight.pop(key, None)
+
+
+# Initialize OpenAI client with OpenRouter.
+# The client is shared and speaks HTTP/2, so concurrent completions from
+# request threads are multiplexed on one kept-alive TLS connection; the
+# timeout keeps a slow provider from pinning worker threads.
 client = OpenAI(
     base_url="https://openrouter.ai/api/v1",
     api_key=config.OPENROUTER_API_KEY,
+    timeout=config.LLM_TIMEOUT,
+    max_retries=config.LLM_MAX_RETRIES,
+    http_client=DefaultHttpxClient(http2=True, limits=httpx.Limits(max_connections=64)),
 )
 
+# LLM answers keyed on (function, model, blake2b of the prompt): re-visited
+# URLs and repeated newsletters skip a ~1s completion entirely.
+_LLM_CACHE: TTLCache = TTLCache(maxsize=8192, ttl=24 * 3600)
+_llm_cache_lock = threading.Lock()
 
-def generate_random_password(length=16):
-    chars = string.ascii_letters + string.digits + "!@#$%^&*"
-    return "".join(secrets.choice(chars) for _ in range(length))
+
+def _memoize_llm(failure):
+    """
+    Cache a single-prompt LLM helper's results by content hash. Results
+    equal to the helper's failure value are not cached, so errors are
+    retried on the next call.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(prompt):
+            key = (
+                func.__name__,
+                config.MODEL_NAME,
+                hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).digest(),
+            )
+            with _llm_cache_lock:
+                cached = _LLM_CACHE.get(key)
+            if cached is not None:
+                return cached
+            result = func(prompt)
+            if result != failure:
+                with _llm_cache_lock:
+                    _LLM_CACHE[key] = result
+            return result
+        return wrapper
+    return decorator
+
+
+# Upper bound for JSON request bodies parsed by parse_json_or_400
+MAX_JSON_BODY = 1 << 20
+
+
+def _load_json_body():
+    """
+    Decode the current request's JSON body with orjson, without caching it
+    on the request. Returns (data, None), with data None when the body is
+    missing or not JSON, or (None, (response, status)) when it is too large.
+    Content-Type and Content-Length are checked before anything is read.
+    """
+    if request.content_length is not None and request.content_length > MAX_JSON_BODY:
+        return None, (jsonify({"error": "Request body too large"}), 413)
+
+    data = None
+    if request.is_json:
+        try:
+            data = orjson.loads(request.get_data(cache=False))
+        except orjson.JSONDecodeError:
+            data = None
+    return data, None
 
 
+def parse_json_or_400(required=frozenset(), message=None):
+    """
+    Parse the current request's body as a JSON object and check that it has
+    the required keys. Returns (data, None) on success or
+    (None, (response, status)) so views can simply `return err`.
+    """
+    data, err = _load_json_body()
+    if err:
+        return None, err
+    if not isinstance(data, dict):
+        data = None
+
+    if data and required.issubset(data):
+        return data, None
+    if message is None:
+        message = f"Missing fields: {set(required.difference(data or ()))}"
+    return None, (jsonify({"error": message}), 400)
+
+
+def parse_json_list_or_400(message, max_items):
+    """
+    Parse the current request's body as a non-empty JSON array of at most
+    max_items entries, for bulk endpoints. Same return shape as
+    parse_json_or_400; the entries themselves are left to the caller.
+    """
+    data, err = _load_json_body()
+    if err:
+        return None, err
+    if not isinstance(data, list) or not data:
+        return None, (jsonify({"error": message}), 400)
+    if len(data) > max_items:
+        return None, (jsonify({"error": f"At most {max_items} items per request"}), 413)
+    return data, None
+
+
+_PW_ALPHABET = (string.ascii_letters + string.digits + "!@#$%^&*").encode("ascii")
+
+
+def generate_random_password(length=16):
+    # One CSPRNG read per round instead of a secrets.choice call per
+    # character; bytes masked to 7 bits and rejected when >= len(alphabet)
+    # keep every character equally likely (no modulo bias).
+    n = len(_PW_ALPHABET)
+    picks = bytearray()
+    while len(picks) < length:
+        for b in secrets.token_bytes(2 * length):
+            b &= 0x7F
+            if b < n:
+                picks.append(_PW_ALPHABET[b])
+    return picks[:length].decode("ascii")
+
+
+@_memoize_llm(failure="UNKNOWN")
 def classify_behavior(prompt):
     try:
         response = client.chat.completions.create(
@@ -54,6 +232,11 @@ def classify_behavior(prompt):
         return "UNKNOWN"
 
 
+# Fallback for models that wrap the JSON object in prose or code fences
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+
+@_memoize_llm(failure={"category": "UNCATEGORIZED"})
 def sort_emails(email_content):
     try:
         response = client.chat.completions.create(
@@ -75,20 +258,17 @@ def sort_emails(email_content):
             temperature=0.3,
         )
 
-        # debug print of raw model dump is OK in dev
-        try:
-            print(json.dumps(response.model_dump(), indent=2))
-        except Exception:
-            pass
+        if config.DEBUG_LLM:
+            logger.debug("sort_emails response: %s", response.model_dump())
         content = response.choices[0].message.content.strip() if response.choices[0].message.content else ""
         if not content:
             raise ValueError("Empty model content received")
 
         try:
-            result = json.loads(content)
-        except json.JSONDecodeError:
-            match = re.search(r"\{.*\}", content, re.DOTALL)
-            result = json.loads(match.group(0)) if match else {"category": "UNCATEGORIZED"}
+            result = orjson.loads(content)
+        except orjson.JSONDecodeError:
+            match = _JSON_OBJECT_RE.search(content)
+            result = orjson.loads(match.group(0)) if match else {"category": "UNCATEGORIZED"}
 
         return result
 
@@ -115,124 +295,346 @@ def summarize_incident(details):
 
 
 def check_email_breach(email):
+    """
+    Look up an email on HIBP. Successful lookups are cached per normalized
+    email for an hour; failures (None) are not cached so they are retried.
+    """
+    email = email.strip().lower()
+    with _hibp_cache_lock:
+        cached = _BREACH_CACHE.get(email)
+    if cached is not None:
+        return cached
+
+    return _coalesced(("email", email), lambda: _lookup_email_breach(email))
+
+
+def _lookup_email_breach(email):
+    result = _check_email_breach_uncached(email)
+    if result is not None:
+        with _hibp_cache_lock:
+            _BREACH_CACHE[email] = result
+    return result
+
+
+def _breach_result(data):
+    breaches = data.get("Breaches") or []
+    pastes = data.get("Pastes") or []
+    return {
+        "found": len(breaches) > 0,
+        "breach_count": len(breaches),
+        "paste_count": len(pastes),
+        "breaches": breaches,
+        "pastes": pastes,
+    }
+
+
+_NO_BREACHES = {"found": False, "breach_count": 0, "paste_count": 0, "breaches": [], "pastes": []}
+_HIBP_JSON_HEADERS = {"Accept": "application/json"}
+
+
+def _check_email_breach_uncached(email):
+    """
+    unifiedsearch answers with JSON, so a plain request on the pooled HIBP
+    client is enough; the headless-browser scrape is only used when
+    HIBP_EMAIL_USE_BROWSER is set (e.g. to debug a blocked client).
+    """
+    if config.HIBP_EMAIL_USE_BROWSER:
+        return _check_email_breach_browser(email)
+
+    url = f"https://haveibeenpwned.com/unifiedsearch/{quote(email)}"
     try:
-        with sync_playwright() as p:
-            encoded_email = quote(email)
-            url = f"https://haveibeenpwned.com/unifiedsearch/{encoded_email}"
-
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            page.set_extra_http_headers({"User-Agent": DEFAULT_UA})
-
-            response = page.goto(url, wait_until="networkidle", timeout=15000)
-            if response is None:
-                browser.close()
-                return None
-
-            status = response.status
-            if status == 200:
-                content = page.content()
-                json_match = re.search(r"<pre>(.*?)</pre>", content, re.DOTALL)
-                if json_match:
-                    json_str = json_match.group(1)
-                    data = json.loads(json_str)
-                    breaches = data.get("Breaches", [])
-                    pastes = data.get("Pastes", [])
-                    browser.close()
-                    return {
-                        "found": len(breaches) > 0,
-                        "breach_count": len(breaches),
-                        "paste_count": len(pastes) if pastes else 0,
-                        "breaches": breaches,
-                        "pastes": pastes if pastes else [],
-                    }
-                else:
-                    # HIBP has changed layout or blocked scraping
-                    browser.close()
-                    print("Could not extract JSON from HIBP page (layout may have changed)")
-                    return None
-            elif status == 404:
-                browser.close()
-                return {"found": False, "breach_count": 0, "paste_count": 0, "breaches": [], "pastes": []}
-            else:
-                browser.close()
-                print(f"HIBP returned status code: {status}")
-                return None
+        resp = _hibp_get(url, _HIBP_JSON_HEADERS, 15)
+    except httpx.HTTPError as e:
+        logger.warning("Error checking breach: %s", e)
+        return None
+
+    if resp.status_code == 404:
+        return dict(_NO_BREACHES)
+    if resp.status_code != 200:
+        logger.warning("HIBP returned status code: %s", resp.status_code)
+        return None
+    try:
+        data = orjson.loads(resp.content)
+    except orjson.JSONDecodeError:
+        data = None
+    if not isinstance(data, dict):
+        # HIBP has changed its format or answered with a challenge page
+        logger.warning("Could not extract JSON from HIBP response")
+        return None
+    return _breach_result(data)
+
+
+async def _fetch_with_shared_browser(url):
+    """
+    Load url in a throwaway context on the app's shared Chromium (launched
+    once, recycled by browser_runtime) and return (status, body); body is
+    only read for 200 answers.
+    """
+    from browser_runtime import new_context  # only loaded when opted in
+    context = await new_context(user_agent=DEFAULT_UA)
+    try:
+        page = await context.new_page()
+        response = await page.goto(url, wait_until="networkidle", timeout=15000)
+        if response is None:
+            return None, None
+        body = await response.body() if response.status == 200 else None
+        return response.status, body
+    finally:
+        await context.close()
+
+
+def _check_email_breach_browser(email):
+    from browser_runtime import run_async
+    url = f"https://haveibeenpwned.com/unifiedsearch/{quote(email)}"
+    try:
+        status, body = run_async(_fetch_with_shared_browser(url), timeout=20)
     except Exception as e:
-        print(f"Error checking breach: {e}")
+        logger.warning("Error checking breach: %s", e)
         return None
 
+    if status is None:
+        return None
+    if status == 200:
+        try:
+            data = orjson.loads(body)
+        except orjson.JSONDecodeError:
+            data = None
+        if isinstance(data, dict):
+            return _breach_result(data)
+        # HIBP has changed layout or blocked scraping
+        logger.warning("Could not extract JSON from HIBP page (layout may have changed)")
+        return None
+    if status == 404:
+        return dict(_NO_BREACHES)
+    logger.warning("HIBP returned status code: %s", status)
+    return None
 
-def check_hibp_api(password: str, timeout: float = 10.0) -> Tuple[bool, int]:
-    if not password:
-        raise ValueError("password required")
 
-    sha1 = hashlib.sha1(password.encode("utf-8")).hexdigest().upper()
-    prefix = sha1[:5]
-    suffix = sha1[5:]
-    url = f"https://api.pwnedpasswords.com/range/{prefix}"
+_HIBP_RANGE_HEADERS = {"Add-Padding": "true"}
+
+
+def _fetch_hibp_range(prefix: str, timeout: float) -> Optional[str]:
+    """
+    Return the HIBP range body for a 5-char SHA-1 prefix, or None on error.
+    Bodies are cached per prefix, so every password sharing the prefix is
+    answered from memory until the entry expires.
+    """
+    with _hibp_cache_lock:
+        cached = _HIBP_RANGE_CACHE.get(prefix)
+    if cached is not None:
+        return cached
+    return _coalesced(("range", prefix), lambda: _download_hibp_range(prefix, timeout))
 
+
+def _download_hibp_range(prefix: str, timeout: float) -> Optional[str]:
+    url = f"https://api.pwnedpasswords.com/range/{prefix}"
     try:
-        resp = requests.get(url, headers={"User-Agent": DEFAULT_UA}, timeout=timeout)
-    except requests.RequestException as e:
+        # Padding hides the real response size; padded entries have count 0
+        resp = _hibp_get(url, _HIBP_RANGE_HEADERS, timeout)
+    except httpx.HTTPError as e:
         print(f"Network error checking HIBP: {e}", file=sys.stderr)
-        return False, 0
+        return None
 
     if resp.status_code == 404 or resp.status_code == 204:
+        body = ""
+    elif resp.status_code != 200:
+        print(f"Error from HIBP API: status {resp.status_code}", file=sys.stderr)
+        return None
+    else:
+        # The body is plain ASCII hex; decoding the bytes directly skips
+        # resp.text's charset handling
+        body = resp.content.decode("ascii", "ignore")
+
+    with _hibp_cache_lock:
+        _HIBP_RANGE_CACHE[prefix] = body
+    return body
+
+
+def _hash_password_sha1(password: str) -> str:
+    if not password:
+        raise ValueError("password required")
+    return hashlib.sha1(password.encode("utf-8")).hexdigest().upper()
+
+
+def _range_count(body: Optional[str], suffix: str) -> Tuple[bool, int]:
+    if not body:
         return False, 0
 
-    if resp.status_code != 200:
-        print(f"Error from HIBP API: status {resp.status_code}", file=sys.stderr)
+    # Every line is "<35-char suffix>:<count>", so "<suffix>:" can only match
+    # at a line start; a C-level find on the cached body beats splitting it
+    # into ~1000 lines on every check.
+    start = body.find(suffix + ":")
+    if start == -1:
+        return False, 0
+    start += len(suffix) + 1
+    end = body.find("\n", start)
+    try:
+        count = int(body[start:] if end == -1 else body[start:end])
+    except ValueError:
         return False, 0
+    return count > 0, count
 
-    for line in resp.text.splitlines():
-        try:
-            line_suffix, count_str = line.split(":")
-            if line_suffix == suffix:
-                return True, int(count_str)
-        except ValueError:
-            continue
 
-    return False, 0
+def check_hibp_api(password: str, timeout: float = 10.0) -> Tuple[bool, int]:
+    sha1 = _hash_password_sha1(password)
+    return _range_count(_fetch_hibp_range(sha1[:5], timeout), sha1[5:])
 
 
-def write_to_csv(log_entry: Any):
+def _csv_row(log_entry: Any) -> tuple:
     """
     Accept either a ChoiceLog instance or a dict-like object with keys:
     user_id, session_id, choice, features.
     """
-    file_exists = os.path.isfile(config.LOG_FILE)
-
-    with open(config.LOG_FILE, mode="a", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=Config.CSV_FIELDS)
-
-        if not file_exists:
-            writer.writeheader()
-
-        if isinstance(log_entry, ChoiceLog):
-            row_data = {
-                "user_id": log_entry.user_id,
-                "session_id": log_entry.session_id,
-                "choice": getattr(log_entry.choice, "value", str(log_entry.choice)),
-                "features": str(log_entry.features),
-            }
-        elif isinstance(log_entry, dict):
-            row_data = {
-                "user_id": log_entry.get("user_id"),
-                "session_id": log_entry.get("session_id"),
-                "choice": log_entry.get("choice"),
-                "features": str(log_entry.get("features", "")),
-            }
-        else:
-            # Fallback: attempt to coerce attributes
-            row_data = {
-                "user_id": getattr(log_entry, "user_id", None),
-                "session_id": getattr(log_entry, "session_id", None),
-                "choice": getattr(log_entry, "choice", None),
-                "features": str(getattr(log_entry, "features", "")),
-            }
+    if isinstance(log_entry, ChoiceLog):
+        return (
+            log_entry.user_id,
+            log_entry.session_id,
+            getattr(log_entry.choice, "value", log_entry.choice),
+            log_entry.features,
+        )
+    if isinstance(log_entry, dict):
+        return (
+            log_entry.get("user_id"),
+            log_entry.get("session_id"),
+            log_entry.get("choice"),
+            log_entry.get("features", ""),
+        )
+    # Fallback: attempt to coerce attributes
+    return (
+        getattr(log_entry, "user_id", None),
+        getattr(log_entry, "session_id", None),
+        getattr(log_entry, "choice", None),
+        getattr(log_entry, "features", ""),
+    )
+
 
-        writer.writerow(row_data)
+_CSV_SPECIAL = re.compile(r'[,"\r\n]')
+
+
+def _csv_field(value: Any) -> str:
+    # Same quoting as csv.QUOTE_MINIMAL with the default dialect
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        value = orjson.dumps(value).decode()
+    else:
+        value = str(value)
+    if _CSV_SPECIAL.search(value):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def _csv_line(log_entry: Any) -> bytes:
+    """Serialize one log entry to a complete CSV line (features as compact JSON)."""
+    return (",".join(map(_csv_field, _csv_row(log_entry))) + "\r\n").encode()
+
+
+_CSV_HEADER = (",".join(Config.CSV_FIELDS) + "\r\n").encode()
+
+# Lines are serialized by request threads and appended in batches by one
+# background thread, so a request never waits on file I/O or fsync.
+_LOG_QUEUE: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+_LOG_BATCH_SIZE = 1000
+_LOG_FLUSH_INTERVAL = 0.2  # seconds
+_LOG_BUFFER_SIZE = 1 << 16
+_LOG_STOP = object()
+_log_thread: threading.Thread | None = None
+_log_thread_lock = threading.Lock()
+
+
+def _open_csv_log():
+    # 64 KiB buffer so a full batch usually reaches the OS in one write()
+    f = open(config.LOG_FILE, mode="ab", buffering=_LOG_BUFFER_SIZE)
+    if f.tell() == 0:
+        f.write(_CSV_HEADER)
+    return f
+
+
+def _csv_log_rotated(f) -> bool:
+    """True when LOG_FILE was moved or deleted (e.g. by logrotate) since f was opened."""
+    try:
+        return os.stat(config.LOG_FILE).st_ino != os.fstat(f.fileno()).st_ino
+    except (OSError, ValueError):
+        # Missing file, or f was closed by a failed reopen: try opening again
+        return True
+
+
+def _csv_flusher():
+    f = _open_csv_log()
+    try:
+        buf = bytearray()
+        stopping = False
+        while not stopping:
+            item = _LOG_QUEUE.get()
+            if item is _LOG_STOP:
+                break
+            buf += item
+            count = 1
+            deadline = time.monotonic() + _LOG_FLUSH_INTERVAL
+            while count < _LOG_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = _LOG_QUEUE.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _LOG_STOP:
+                    stopping = True
+                    break
+                buf += item
+                count += 1
+
+            try:
+                # One stat per batch, not per line, to follow log rotation
+                if _csv_log_rotated(f):
+                    f.close()
+                    f = _open_csv_log()
+                f.write(buf)
+                f.flush()
+                os.fsync(f.fileno())
+            except Exception as e:
+                print(f"CSV Log Write Error: {e}", file=sys.stderr)
+            finally:
+                buf.clear()
+    finally:
+        f.close()
+
+
+def _stop_csv_flusher():
+    if _log_thread is not None and _log_thread.is_alive():
+        _LOG_QUEUE.put(_LOG_STOP)
+        _log_thread.join(timeout=5)
+
+
+def write_to_csv(log_entry: Any):
+    """
+    Queue a ChoiceLog, dict-like log entry or an already serialized CSV
+    line (bytes) for the background writer. Returns immediately; lines are
+    flushed every 200ms or 1000 lines.
+    """
+    global _log_thread
+    if _log_thread is None:
+        with _log_thread_lock:
+            if _log_thread is None:
+                _log_thread = threading.Thread(target=_csv_flusher, name="csv-log-flusher", daemon=True)
+                _log_thread.start()
+                atexit.register(_stop_csv_flusher)
+
+    _LOG_QUEUE.put(log_entry if isinstance(log_entry, bytes) else _csv_line(log_entry))
+
+
+def _url_domain(url: str) -> str:
+    return url.rpartition('//')[2].partition('/')[0].lower()
+
+
+def session_domains(urls) -> Dict[str, None]:
+    """
+    Distinct lower-cased hosts of a session's tab URLs, in visit order.
+    Pass it as session_data['domains'] so correlate_leak_to_session does a
+    hash lookup instead of re-parsing every tab URL.
+    """
+    return dict.fromkeys(_url_domain(url) for url in urls)
 
 
 def correlate_leak_to_session(leak_info, session_data, alias_data=None):
@@ -264,17 +666,18 @@ def correlate_leak_to_session(leak_info, session_data, alias_data=None):
             correlation_factors['time_proximity'] = 0.1
     
     # Site match analysis
-    if leak_info.get('breach_source') and session_data.get('tabs'):
-        breach_domain = leak_info['breach_source'].split('//')[-1].split('/')[0].lower()
-        session_domains = [tab['url'].split('//')[-1].split('/')[0].lower() 
-                          for tab in session_data.get('tabs', [])]
-        
-        if breach_domain in session_domains:
+    domains = session_data.get('domains')
+    if domains is None:
+        domains = session_domains(tab['url'] for tab in session_data.get('tabs') or ())
+    if leak_info.get('breach_source') and domains:
+        breach_domain = _url_domain(leak_info['breach_source'])
+
+        if breach_domain in domains:
             correlation_factors['site_match'] = 0.9
             correlation_factors['behavioral_indicators'].append(f"User visited breach site: {breach_domain}")
         else:
             # Check for similar domains
-            for session_domain in session_domains:
+            for session_domain in domains:
                 if breach_domain in session_domain or session_domain in breach_domain:
                     correlation_factors['site_match'] = 0.6
                     correlation_factors['behavioral_indicators'].append(f"Similar domain found: {session_domain}")